@@ -1,64 +1,28 @@
 # 03_rekap_gender.py
-import os
 import io
 import pandas as pd
 import streamlit as st
-from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 import matplotlib.pyplot as plt
 
+from pwh_db import require_engine
+from pwh_rollup import dashboard_rollups
+
 # --- Konfigurasi Halaman Streamlit ---
 st.set_page_config(page_title="Rekapitulasi per Jenis Kelamin", page_icon="🚻", layout="wide")
 st.title("🚻 Rekapitulasi Pasien berdasarkan Kategori dan Jenis Kelamin")
 st.markdown("Dashboard ini menampilkan rekapitulasi dan grafik pasien berdasarkan jenis hemofilia dan jenis kelamin (Laki-laki/Perempuan).")
 
-# --- KONEKSI DATABASE ---
-def _resolve_db_url() -> str:
-    """Mencari DATABASE_URL dari st.secrets atau environment variables."""
-    try:
-        sec = st.secrets.get("DATABASE_URL", "")
-        if sec: return sec
-    except Exception:
-        pass
-    env = os.environ.get("DATABASE_URL")
-    if env: return env
-    
-    st.error('DATABASE_URL tidak ditemukan. Mohon atur di `.streamlit/secrets.toml`.')
-    return None
-
-@st.cache_resource(show_spinner="Menghubungkan ke database...")
-def get_engine(dsn: str) -> Engine:
-    """Membuat dan menyimpan koneksi database engine."""
-    if not dsn:
-        st.stop()
-    try:
-        engine = create_engine(dsn, pool_pre_ping=True)
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        return engine
-    except Exception as e:
-        st.error(f"Gagal terhubung ke database: {e}")
-        st.stop()
-
 # --- FUNGSI PENGOLAHAN DATA ---
 
 def fetch_data_for_gender(_engine: Engine) -> pd.DataFrame:
     """
-    Mengambil data jenis kelamin pasien dan diagnosis hemofilia.
+    Jumlah baris diagnosis per (jenis kelamin, hemo_type) seperti sebelumnya,
+    dari rollup bersama halaman rekap (pwh_rollup.py); dihitung ulang hanya jika
+    versi data berubah.
     """
-    st.info("🔄 Mengambil data terbaru dari database...")
-    query = text("""
-        SELECT
-            p.gender AS jenis_kelamin,
-            d.hemo_type
-        FROM pwh.patients p
-        JOIN pwh.hemo_diagnoses d ON p.id = d.patient_id
-        WHERE p.gender IS NOT NULL AND d.hemo_type IS NOT NULL;
-    """)
     try:
-        with _engine.connect() as connection:
-            df = pd.read_sql(query, connection)
-        return df
+        return dashboard_rollups(_engine)[("gender", "hemo_type")].rename(columns={"gender": "jenis_kelamin"})
     except Exception as e:
         st.error(f"Gagal mengambil data: {e}")
         st.info("Pastikan tabel 'pwh.patients' memiliki kolom 'gender' dan 'pwh.hemo_diagnoses' memiliki kolom 'hemo_type'.")
@@ -85,7 +49,8 @@ def create_gender_summary_table(df: pd.DataFrame) -> pd.DataFrame:
         df, 
         index='Kategori', 
         columns='jenis_kelamin', 
-        aggfunc='size', 
+        values='jumlah_diagnosis',
+        aggfunc='sum', 
         fill_value=0
     )
     
@@ -131,34 +96,32 @@ def plot_gender_graph(summary_df: pd.DataFrame) -> plt.Figure:
     return fig
 
 # --- MAIN APP LOGIC ---
-db_url = _resolve_db_url()
-if db_url:
-    engine = get_engine(db_url)
-    data_df = fetch_data_for_gender(engine)
-
-    if data_df.empty:
-        st.warning("Tidak ada data yang dapat ditampilkan dari database.")
-    else:
-        rekap_table = create_gender_summary_table(data_df)
-
-        st.subheader("Tabel Rekapitulasi")
-        st.dataframe(rekap_table, use_container_width=True)
-
-        # --- FUNGSI DOWNLOAD EXCEL ---
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            rekap_table.to_excel(writer, index=True, sheet_name='Rekapitulasi Gender')
-        excel_data = output.getvalue()
-
-        st.download_button(
-           label="📥 Download Rekapitulasi (Excel)",
-           data=excel_data,
-           file_name='rekapitulasi_jenis_kelamin.xlsx',
-           mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        )
-        
-        st.markdown("---")
+engine = require_engine()
+data_df = fetch_data_for_gender(engine)
+
+if data_df.empty:
+    st.warning("Tidak ada data yang dapat ditampilkan dari database.")
+else:
+    rekap_table = create_gender_summary_table(data_df)
+
+    st.subheader("Tabel Rekapitulasi")
+    st.dataframe(rekap_table, use_container_width=True)
+
+    # --- FUNGSI DOWNLOAD EXCEL ---
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        rekap_table.to_excel(writer, index=True, sheet_name='Rekapitulasi Gender')
+    excel_data = output.getvalue()
+
+    st.download_button(
+       label="📥 Download Rekapitulasi (Excel)",
+       data=excel_data,
+       file_name='rekapitulasi_jenis_kelamin.xlsx',
+       mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+    
+    st.markdown("---")
 
-        st.subheader("Grafik Visualisasi")
-        fig = plot_gender_graph(rekap_table)
-        st.pyplot(fig)
+    st.subheader("Grafik Visualisasi")
+    fig = plot_gender_graph(rekap_table)
+    st.pyplot(fig)
@@ -1,12 +1,13 @@
 # 06_rekap_provinsi.py
-import os
 import io
 import pandas as pd
 import streamlit as st
-from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 import matplotlib.pyplot as plt
 
+from pwh_db import require_engine
+from pwh_rollup import dashboard_rollups
+
 # ========================= KONFIGURASI HALAMAN =========================
 st.set_page_config(
     page_title="Rekapitulasi berdasarkan Provinsi",
@@ -19,44 +20,11 @@ st.markdown(
     "berdasarkan kolom `pwh.province` pada tabel **pwh.patients**."
 )
 
-# ========================= KONEKSI DATABASE =========================
-def _resolve_db_url() -> str:
-    try:
-        sec = st.secrets.get("DATABASE_URL", "")
-        if sec:
-            return sec
-    except Exception:
-        pass
-    env = os.environ.get("DATABASE_URL")
-    if env:
-        return env
-    st.error("DATABASE_URL tidak ditemukan. Atur di `.streamlit/secrets.toml` atau environment variable.")
-    st.stop()
-
-@st.cache_resource(show_spinner="🔌 Menghubungkan ke database...")
-def get_engine(dsn: str) -> Engine:
-    try:
-        engine = create_engine(dsn, pool_pre_ping=True)
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        return engine
-    except Exception as e:
-        st.error(f"Gagal terhubung ke database: {e}")
-        st.stop()
-
 # ========================= QUERY DATA =========================
 def _fetch_count_by_column(engine: Engine, column: str) -> pd.DataFrame:
-    q = text(f"""
-        SELECT
-            COALESCE(NULLIF(TRIM({column}::text), ''), 'Unknown') AS province,
-            COUNT(*)::int AS jumlah
-        FROM pwh.patients
-        GROUP BY 1
-        ORDER BY jumlah DESC, province ASC;
-    """)
+    # Dari rollup bersama (pwh_rollup.py), satu query untuk semua halaman rekap
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(q, conn)
+        df = dashboard_rollups(engine)[(column,)].rename(columns={column: "province"})
         total = int(df["jumlah"].sum()) if not df.empty else 0
         df["persentase"] = (df["jumlah"] / total * 100).round(2) if total > 0 else 0.0
         return df
@@ -110,8 +78,7 @@ def plot_bar_with_labels(df: pd.DataFrame) -> plt.Figure:
     return fig
 
 # ========================= MAIN =========================
-db_url = _resolve_db_url()
-engine = get_engine(db_url)
+engine = require_engine()
 
 df_prov = _fetch_count_by_column(engine, "province")
 
@@ -4,7 +4,9 @@ import streamlit as st
 import pydeck as pdk
 import requests
 from typing import Callable, Optional
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+
+from pwh_db import get_engine, note_engine_created
 
 # =========================
 # KONFIGURASI HALAMAN
@@ -19,26 +21,29 @@ st.title("🗺️ Peta Jumlah Pasien per Kota (Hemofilia)")
 # =========================
 # UTIL KONEKSI (dual-mode)
 # =========================
+@st.cache_resource(show_spinner=False)
 def _build_query_runner() -> Callable[[str], pd.DataFrame]:
+    # Di-cache per proses: probe st.connection dan pembuatan engine hanya
+    # terjadi sekali, bukan setiap rerun (mis. saat slider digeser).
     try:
         conn = st.connection("postgresql", type="sql")
         def _run_query_streamlit(sql: str) -> pd.DataFrame:
             return conn.query(sql)
         _ = _run_query_streamlit("SELECT 1 as ok;")
+        note_engine_created("st.connection:postgresql")
         return _run_query_streamlit
     except Exception:
         pass
 
-    db_url = st.secrets.get("DATABASE_URL", os.getenv("DATABASE_URL", ""))
-    if not db_url:
+    try:
+        engine = get_engine()
+    except RuntimeError:
         st.error("❌ Koneksi DB tidak dikonfigurasi. Set 'connections.postgresql' di secrets.toml atau 'DATABASE_URL' di secrets.")
         st.stop()
-    engine = create_engine(db_url, pool_pre_ping=True)
 
     def _run_query_engine(sql: str) -> pd.DataFrame:
         with engine.connect() as con:
             return pd.read_sql(text(sql), con)
-    _ = _run_query_engine("SELECT 1 as ok;")
     return _run_query_engine
 
 run_query = _build_query_runner()
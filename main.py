@@ -1,8 +1,9 @@
 # main.py (gabungan)
-import runpy
 import streamlit as st
 from streamlit_option_menu import option_menu
 
+from pwh_pages import load_page
+
 # -----------------------------
 # Konfigurasi halaman
 # -----------------------------
@@ -111,10 +112,10 @@ def main():
                 st.session_state.clear()
                 st.rerun()
 
-    # Muat halaman sesuai pilihan
+    # Muat halaman sesuai pilihan (dikompilasi sekali per proses, lihat pwh_pages.py)
     page_path = MENU_ITEMS[selection]
     try:
-        runpy.run_path(page_path, run_name="__main__")
+        load_page(page_path).run(st.session_state)
     except FileNotFoundError:
         st.error(f"File halaman tidak ditemukan: `{page_path}`")
     except Exception as e:
@@ -0,0 +1,663 @@
+# pwh_bulk.py (Mesin import bulk dari Template Excel)
+#
+# Setiap sheet template dialirkan ke tabel staging sementara dengan COPY, id pasien
+# diselesaikan dengan join berbasis set, lalu data digabung ke tabel pwh.* dengan
+# beberapa `INSERT ... SELECT` (ON CONFLICT untuk tabel yang punya kunci unik).
+# Setiap chunk adalah satu transaksi yang sekaligus mencatat checkpoint di
+# pwh.import_jobs, sehingga import yang terputus bisa dilanjutkan.
+# Modul ini tidak mengimpor streamlit agar bisa dipakai dari skrip/CLI.
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator
+
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("pwh_bulk")
+
+# ------------------------------------------------------------------------------
+# Spesifikasi sheet: header Bahasa Indonesia -> kolom internal, dan tipe kolom
+# ------------------------------------------------------------------------------
+TRUE_VALUES = ["true", "1", "yes", "ya", "y"]
+CHUNK_ROWS = 5000  # baris per chunk saat membaca workbook & COPY ke staging
+SHEET_WORKERS = 3  # sheet turunan yang diimpor bersamaan (tiap worker = 1 koneksi pool)
+
+MAP_PAT = {
+    "Nama Lengkap": "full_name", "Tempat Lahir": "birth_place", "Tanggal Lahir": "birth_date", "NIK": "nik",
+    "Gol. Darah": "blood_group", "Rhesus": "rhesus", "Jenis Kelamin": "gender", "Pekerjaan": "occupation",
+    "Pendidikan Terakhir": "education", "Alamat": "address", "No. Ponsel": "phone", "Propinsi": "province",
+    "Kabupaten/Kota": "city", "Kecamatan": "district", "Kelurahan/Desa": "village",
+    "HMHI Cabang": "cabang", "Kota Cakupan Cabang": "kota_cakupan",
+    "Catatan": "note"
+}
+MAP_DIAG = {
+    "Nama Lengkap": "full_name", "Jenis Hemofilia": "hemo_type", "Kategori": "severity",
+    "Tgl Diagnosis": "diagnosed_on", "Sumber": "source", "patient_id": "patient_id"
+}
+MAP_INH = {
+    "Nama Lengkap": "full_name", "Faktor": "factor", "Titer (BU)": "titer_bu",
+    "Tgl Ukur": "measured_on", "Lab": "lab", "patient_id": "patient_id"
+}
+MAP_VIRUS = {
+    "Nama Lengkap": "full_name", "Jenis Tes": "test_type", "Hasil": "result",
+    "Tgl Tes": "tested_on", "Lab": "lab", "patient_id": "patient_id"
+}
+MAP_HOSP = {
+    "Nama Lengkap": "full_name", "Nama RS": "name_hospital", "Kota RS": "city_hospital", "Provinsi RS": "province_hospital",
+    "Tanggal Kunjungan": "date_of_visit", "DPJP": "doctor_in_charge", "Jenis Penanganan": "treatment_type",
+    "Layanan Rawat": "care_services", "Frekuensi": "frequency", "Dosis": "dose", "Produk": "product",
+    "Merk": "merk", "patient_id": "patient_id"
+}
+MAP_DEATH = {
+    "Nama Lengkap": "full_name", "Penyebab Kematian": "cause_of_death", "Tahun Kematian": "year_of_death",
+    "patient_id": "patient_id"
+}
+MAP_CONTACT = {
+    "Nama Lengkap": "full_name", "Relasi": "relation", "Nama Kontak": "name", "No. Telp": "phone",
+    "Primary": "is_primary", "patient_id": "patient_id"
+}
+
+# label hasil -> (nama sheet lowercase, tabel tujuan, peta header, {kolom: tipe})
+# Tipe: str | date | bool | int | num. Kolom `full_name` di sheet turunan hanya
+# dipakai untuk mencari id pasien.
+SHEETS = {
+    "Pasien": ("pasien", "pwh.patients", MAP_PAT, {
+        "full_name": "str", "birth_place": "str", "birth_date": "date", "nik": "str", "blood_group": "str",
+        "rhesus": "str", "gender": "str", "occupation": "str", "education": "str", "address": "str",
+        "phone": "str", "province": "str", "city": "str", "note": "str", "village": "str", "district": "str",
+        "cabang": "str", "kota_cakupan": "str",
+    }),
+    "Diagnosa": ("diagnosa", "pwh.hemo_diagnoses", MAP_DIAG, {
+        "patient_id": "int", "full_name": "str", "hemo_type": "str", "severity": "str",
+        "diagnosed_on": "date", "source": "str",
+    }),
+    "Inhibitor": ("inhibitor", "pwh.hemo_inhibitors", MAP_INH, {
+        "patient_id": "int", "full_name": "str", "factor": "str", "titer_bu": "num",
+        "measured_on": "date", "lab": "str",
+    }),
+    "Virus Tes": ("virus tes", "pwh.virus_tests", MAP_VIRUS, {
+        "patient_id": "int", "full_name": "str", "test_type": "str", "result": "str",
+        "tested_on": "date", "lab": "str",
+    }),
+    "RS Penangan": ("rs penangan", "pwh.treatment_hospital", MAP_HOSP, {
+        "patient_id": "int", "full_name": "str", "name_hospital": "str", "city_hospital": "str",
+        "province_hospital": "str", "date_of_visit": "date", "doctor_in_charge": "str", "treatment_type": "str",
+        "care_services": "str", "frequency": "str", "dose": "str", "product": "str", "merk": "str",
+    }),
+    "Kematian": ("kematian", "pwh.death", MAP_DEATH, {
+        "patient_id": "int", "full_name": "str", "cause_of_death": "str", "year_of_death": "int",
+    }),
+    "Kontak": ("kontak", "pwh.contacts", MAP_CONTACT, {
+        "patient_id": "int", "full_name": "str", "relation": "str", "name": "str", "phone": "str",
+        "is_primary": "bool",
+    }),
+}
+
+# ------------------------------------------------------------------------------
+# Merge staging -> pwh.* (satu statement per sheet)
+# ------------------------------------------------------------------------------
+# Hanya id pasien yang benar-benar ada yang diimpor (JOIN pwh.patients).
+# Untuk ON CONFLICT DO UPDATE, baris duplikat dalam satu chunk diringkas dengan
+# DISTINCT ON: baris terakhir di sheet yang menang, sama seperti insert berurutan.
+# Tabel tanpa kunci unik (inhibitor, RS penangan, kontak) memakai anti-join
+# NOT EXISTS agar import ulang file yang sama tidak menggandakan baris.
+MERGE_SQL = {
+    "Pasien": """
+        INSERT INTO pwh.patients (full_name, birth_place, birth_date, nik, blood_group, rhesus, gender, occupation, education, address, phone, province, city, note, village, district, cabang, kota_cakupan)
+        SELECT full_name, birth_place, birth_date, nik, blood_group, rhesus, gender, occupation, education, address, phone, province, city, note, village, district, cabang, kota_cakupan
+        FROM {stg}
+        WHERE full_name IS NOT NULL
+        ORDER BY row_no;
+    """,
+    "Diagnosa": """
+        INSERT INTO pwh.hemo_diagnoses (patient_id, hemo_type, severity, diagnosed_on, source)
+        SELECT DISTINCT ON (s.patient_id, s.hemo_type) s.patient_id, s.hemo_type, s.severity, s.diagnosed_on, s.source
+        FROM {stg} s JOIN pwh.patients p ON p.id = s.patient_id
+        WHERE s.hemo_type IS NOT NULL
+        ORDER BY s.patient_id, s.hemo_type, s.row_no DESC
+        ON CONFLICT (patient_id, hemo_type) DO UPDATE SET severity = EXCLUDED.severity, diagnosed_on = COALESCE(EXCLUDED.diagnosed_on, pwh.hemo_diagnoses.diagnosed_on), source = COALESCE(EXCLUDED.source, pwh.hemo_diagnoses.source);
+    """,
+    "Inhibitor": """
+        INSERT INTO pwh.hemo_inhibitors (patient_id, factor, titer_bu, measured_on, lab)
+        SELECT s.patient_id, s.factor, s.titer_bu, s.measured_on, s.lab
+        FROM {stg} s JOIN pwh.patients p ON p.id = s.patient_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM pwh.hemo_inhibitors t
+            WHERE t.patient_id = s.patient_id AND t.factor IS NOT DISTINCT FROM s.factor
+              AND t.titer_bu IS NOT DISTINCT FROM s.titer_bu AND t.measured_on IS NOT DISTINCT FROM s.measured_on
+              AND t.lab IS NOT DISTINCT FROM s.lab
+        )
+        ORDER BY s.row_no;
+    """,
+    "Virus Tes": """
+        INSERT INTO pwh.virus_tests (patient_id, test_type, result, tested_on, lab)
+        SELECT s.patient_id, s.test_type, s.result, s.tested_on, s.lab
+        FROM {stg} s JOIN pwh.patients p ON p.id = s.patient_id
+        WHERE s.test_type IS NOT NULL
+        ORDER BY s.row_no
+        ON CONFLICT (patient_id, test_type, tested_on) DO NOTHING;
+    """,
+    "RS Penangan": """
+        INSERT INTO pwh.treatment_hospital (patient_id, name_hospital, city_hospital, province_hospital, date_of_visit, doctor_in_charge, treatment_type, care_services, frequency, dose, product, merk)
+        SELECT s.patient_id, s.name_hospital, s.city_hospital, s.province_hospital, s.date_of_visit, s.doctor_in_charge, s.treatment_type, s.care_services, s.frequency, s.dose, s.product, s.merk
+        FROM {stg} s JOIN pwh.patients p ON p.id = s.patient_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM pwh.treatment_hospital t
+            WHERE t.patient_id = s.patient_id AND t.name_hospital IS NOT DISTINCT FROM s.name_hospital
+              AND t.city_hospital IS NOT DISTINCT FROM s.city_hospital AND t.province_hospital IS NOT DISTINCT FROM s.province_hospital
+              AND t.date_of_visit IS NOT DISTINCT FROM s.date_of_visit AND t.doctor_in_charge IS NOT DISTINCT FROM s.doctor_in_charge
+              AND t.treatment_type IS NOT DISTINCT FROM s.treatment_type AND t.care_services IS NOT DISTINCT FROM s.care_services
+              AND t.frequency IS NOT DISTINCT FROM s.frequency AND t.dose IS NOT DISTINCT FROM s.dose
+              AND t.product IS NOT DISTINCT FROM s.product AND t.merk IS NOT DISTINCT FROM s.merk
+        )
+        ORDER BY s.row_no;
+    """,
+    "Kematian": """
+        INSERT INTO pwh.death (patient_id, cause_of_death, year_of_death)
+        SELECT DISTINCT ON (s.patient_id) s.patient_id, s.cause_of_death, s.year_of_death
+        FROM {stg} s JOIN pwh.patients p ON p.id = s.patient_id
+        ORDER BY s.patient_id, s.row_no DESC
+        ON CONFLICT (patient_id) DO UPDATE SET cause_of_death = EXCLUDED.cause_of_death, year_of_death = EXCLUDED.year_of_death;
+    """,
+    "Kontak": """
+        INSERT INTO pwh.contacts (patient_id, relation, name, phone, is_primary)
+        SELECT s.patient_id, s.relation, s.name, s.phone, COALESCE(s.is_primary, false)
+        FROM {stg} s JOIN pwh.patients p ON p.id = s.patient_id
+        WHERE s.name IS NOT NULL
+          AND NOT EXISTS (
+            SELECT 1 FROM pwh.contacts t
+            WHERE t.patient_id = s.patient_id AND t.relation IS NOT DISTINCT FROM s.relation
+              AND t.name = s.name AND t.phone IS NOT DISTINCT FROM s.phone
+        )
+        ORDER BY s.row_no;
+    """,
+}
+
+# Id pasien dari nama (case-insensitive). Nama unik dari workbook dikirim sebagai
+# satu parameter array dan dicocokkan lewat indeks lower(full_name)
+# (sql/005_patient_name_index.sql). Nama yang cocok ke lebih dari satu pasien
+# tidak di-resolve (validate_workbook melaporkannya sebagai ambigu).
+RESOLVE_SQL = """
+    UPDATE {stg} s SET patient_id = r.id
+    FROM (
+        SELECT lower(p.full_name) AS name_key, min(p.id) AS id
+        FROM pwh.patients p
+        WHERE lower(p.full_name) = ANY(:names)
+        GROUP BY lower(p.full_name)
+        HAVING count(*) = 1
+    ) r
+    WHERE s.patient_id IS NULL AND lower(s.full_name) = r.name_key;
+"""
+
+MATCH_NAMES_SQL = """
+    SELECT n.name_key, array_agg(p.id ORDER BY p.id)
+    FROM unnest(CAST(:names AS text[])) AS n(name_key)
+    JOIN pwh.patients p ON lower(p.full_name) = n.name_key
+    GROUP BY n.name_key;
+"""
+
+
+def match_names(conn, names: list[str]) -> dict[str, list[int]]:
+    """{nama lowercase: [id pasien, ...]} untuk nama yang ada di pwh.patients (satu query)."""
+    if not names:
+        return {}
+    rows = conn.execute(text(MATCH_NAMES_SQL), {"names": list(names)})
+    return {key: list(ids) for key, ids in rows}
+
+# ------------------------------------------------------------------------------
+# Baca & konversi tipe (per kolom, bukan per sel)
+# ------------------------------------------------------------------------------
+def coerce_frame(df: pd.DataFrame, columns: dict[str, str]) -> pd.DataFrame:
+    """Konversi kolom sesuai tipe di SHEETS; nilai yang tidak valid menjadi NULL."""
+    out = pd.DataFrame(index=df.index)
+    for col, kind in columns.items():
+        s = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype="object")
+        if kind == "str":
+            s = s.astype("string").str.strip()
+            out[col] = s.mask(s == "")
+        elif kind == "date":
+            out[col] = pd.to_datetime(s, errors="coerce", format="mixed").dt.date
+        elif kind == "bool":
+            out[col] = s.astype("string").str.strip().str.lower().isin(TRUE_VALUES)
+        elif kind == "int":
+            out[col] = pd.to_numeric(s, errors="coerce").round().astype("Int64")
+        else:
+            out[col] = pd.to_numeric(s, errors="coerce")
+    return out
+
+
+def _is_blank(v) -> bool:
+    return v is None or (isinstance(v, str) and not v.strip())
+
+
+def open_workbook(file):
+    """
+    Workbook read_only dari path, bytes, atau file-like (diputar ke awal agar
+    bisa dibaca ulang: validasi lalu import).
+    """
+    if isinstance(file, (bytes, bytearray)):
+        file = io.BytesIO(file)
+    elif hasattr(file, "seek"):
+        file.seek(0)
+    return load_workbook(file, read_only=True, data_only=True)
+
+
+def iter_sheet_chunks(wb, label: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Baca satu sheet secara streaming (workbook mode read_only) dan hasilkan
+    DataFrame mentah (belum dikonversi, index = nomor baris Excel) per
+    `chunk_rows` baris. Hanya kolom yang dikenal yang disimpan, sehingga memori
+    puncak sebanding dengan ukuran chunk, bukan file.
+    """
+    sheet, _, headers, columns = SHEETS[label]
+    names = {name.lower(): name for name in wb.sheetnames}
+    if sheet not in names:
+        return
+    rows = wb[names[sheet]].iter_rows(values_only=True)
+    header = next(rows, None) or ()
+    picks = []  # (posisi kolom di sheet, nama internal)
+    for i, h in enumerate(header):
+        name = headers.get(str(h).strip()) if h is not None else None
+        if name in columns:
+            picks.append((i, name))
+    cols = [name for _, name in picks]
+
+    buf, row_nos = [], []
+    for row_no, row in enumerate(rows, start=2):
+        if all(_is_blank(v) for v in row):
+            continue
+        buf.append([row[i] if i < len(row) else None for i, _ in picks])
+        row_nos.append(row_no)
+        if len(buf) >= chunk_rows:
+            yield pd.DataFrame(buf, columns=cols, index=row_nos, dtype="object")
+            buf, row_nos = [], []
+    if buf:
+        yield pd.DataFrame(buf, columns=cols, index=row_nos, dtype="object")
+
+
+# ------------------------------------------------------------------------------
+# Staging + COPY
+# ------------------------------------------------------------------------------
+def _stage(conn, label: str) -> str:
+    """Buat tabel staging sementara (tipe kolom mengikuti tabel tujuan)."""
+    _, table, _, columns = SHEETS[label]
+    stg = f"stg_{table.split('.')[-1]}"
+    target_cols = [c for c in columns if c != "full_name" or label == "Pasien"]
+    conn.execute(text(
+        f"CREATE TEMP TABLE {stg} ON COMMIT DROP AS SELECT {', '.join(target_cols)} FROM {table} WITH NO DATA;"
+    ))
+    extra = "ADD COLUMN row_no integer" if label == "Pasien" else "ADD COLUMN full_name text, ADD COLUMN row_no integer"
+    conn.execute(text(f"ALTER TABLE {stg} {extra};"))
+    return stg
+
+
+def _copy_frame(conn, stg: str, df: pd.DataFrame):
+    """COPY DataFrame ke tabel staging lewat koneksi DBAPI dari transaksi yang sama."""
+    df = df.assign(row_no=df.index)
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    with conn.connection.dbapi_connection.cursor() as cur:
+        cur.copy_expert(f"COPY {stg} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def _import_chunk(conn, label: str, df: pd.DataFrame) -> int:
+    stg = _stage(conn, label)
+    _copy_frame(conn, stg, df)
+    if label != "Pasien":
+        names = sorted(set(df.loc[df["patient_id"].isna(), "full_name"].dropna().str.lower()))
+        conn.execute(text(RESOLVE_SQL.format(stg=stg)), {"names": names})
+    return conn.execute(text(MERGE_SQL[label].format(stg=stg))).rowcount
+
+
+def _import_sheet(engine: Engine, source, label: str, chunk_rows: int, skip_chunks: int,
+                  job_id: int | None, progress: Callable[[str, int, int], None] | None = None) -> int:
+    """
+    Import satu sheet per chunk (satu transaksi per chunk). Membuka workbook
+    sendiri karena workbook read_only openpyxl tidak aman dipakai bersama antar thread.
+    """
+    total = 0
+    wb = open_workbook(source)
+    try:
+        for c_idx, chunk in enumerate(iter_sheet_chunks(wb, label, chunk_rows)):
+            if c_idx < skip_chunks:
+                continue
+            df = coerce_frame(chunk, SHEETS[label][3])
+            with engine.begin() as conn:
+                n = _import_chunk(conn, label, df)
+                total += n
+                if job_id is not None:
+                    _checkpoint(conn, job_id, label, c_idx, len(df), n)
+            if progress:
+                progress(label, c_idx, len(df))
+    finally:
+        wb.close()
+    return total
+
+
+def import_workbook(engine: Engine, file, chunk_rows: int = CHUNK_ROWS, job_id: int | None = None,
+                    workers: int = SHEET_WORKERS, progress: Callable[[str, int, int], None] | None = None) -> dict:
+    """
+    Import Template Excel (file path atau file-like) ke database. Setiap sheet
+    dibaca per chunk; tiap chunk di-COPY ke staging dan digabung ke pwh.* dalam
+    transaksinya sendiri. Jalankan validate_workbook() lebih dulu.
+    Sheet Pasien diimpor lebih dulu; enam sheet turunan saling independen dan
+    dijalankan paralel di thread pool terbatas (`workers`), masing-masing dengan
+    koneksi pool sendiri.
+    Dengan `job_id`, checkpoint ditulis di transaksi yang sama dan chunk yang
+    sudah tercatat di pwh.import_jobs dilewati (melanjutkan import yang terputus).
+    `progress(sheet, chunk, jumlah_baris)` dipanggil setelah setiap chunk commit
+    (bisa dari beberapa thread sekaligus).
+    Return: {label sheet: jumlah baris yang masuk/diperbarui}.
+    """
+    job = job_status(engine, job_id) if job_id is not None else None
+    labels = list(SHEETS)
+    results = {label: 0 for label in labels}
+    done = {}  # label -> jumlah chunk yang sudah commit
+    if job:
+        chunk_rows = job["chunk_rows"]
+        results.update(job["counts"] or {})
+        done = {label: last + 1 for label, last in (job["chunks"] or {}).items()}
+
+    # Setiap worker membuka workbook sendiri -> sumbernya harus bisa dibaca ulang
+    if hasattr(file, "read"):
+        file.seek(0)
+        file = file.read()
+    elif not isinstance(file, (str, bytes)):
+        file = bytes(file)  # bytearray / memoryview
+
+    results["Pasien"] += _import_sheet(engine, file, "Pasien", chunk_rows, done.get("Pasien", 0), job_id, progress)
+
+    children = labels[1:]
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(children))), thread_name_prefix="pwh-import") as pool:
+        futures = {
+            pool.submit(_import_sheet, engine, file, label, chunk_rows, done.get(label, 0), job_id, progress): label
+            for label in children
+        }
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] += future.result()
+            except Exception as e:
+                # Sheet lain tetap diselesaikan; checkpoint-nya valid untuk resume
+                errors.append(f"{futures[future]}: {e}")
+    if errors:
+        raise RuntimeError("; ".join(errors))
+    return results
+
+# ------------------------------------------------------------------------------
+# Job import (sql/006_import_jobs.sql): checkpoint per chunk & progres
+# ------------------------------------------------------------------------------
+STALE_AFTER = 300  # detik tanpa checkpoint sebelum job 'running' dianggap terputus
+
+JOB_COLUMNS = "id, workbook_hash, file_name, status, sheet, last_chunk, chunks, chunk_rows, rows_done, rows_total, counts, error, created_at, updated_at"
+
+
+def workbook_hash(file) -> str:
+    """SHA-256 isi workbook (file path, bytes, atau file-like)."""
+    h = hashlib.sha256()
+    if isinstance(file, (bytes, bytearray)):
+        h.update(file)
+        return h.hexdigest()
+    f = open(file, "rb") if isinstance(file, str) else file
+    try:
+        f.seek(0)
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    finally:
+        if f is not file:
+            f.close()
+        else:
+            f.seek(0)
+    return h.hexdigest()
+
+
+def _checkpoint(conn, job_id: int, label: str, chunk: int, rows: int, merged: int):
+    # Update atomik per sheet: aman dipanggil bersamaan dari beberapa worker
+    conn.execute(text("""
+        UPDATE pwh.import_jobs
+        SET sheet = :sheet, last_chunk = :chunk, rows_done = rows_done + :rows,
+            chunks = chunks || jsonb_build_object(CAST(:sheet AS text), :chunk),
+            counts = counts || jsonb_build_object(CAST(:sheet AS text), COALESCE((counts ->> CAST(:sheet AS text))::int, 0) + :merged),
+            updated_at = now()
+        WHERE id = :id;
+    """), {"id": job_id, "sheet": label, "chunk": chunk, "rows": rows, "merged": merged})
+
+
+def job_status(engine: Engine, job_id: int) -> dict | None:
+    """Satu baris pwh.import_jobs sebagai dict (None jika tidak ada)."""
+    with engine.connect() as conn:
+        row = conn.execute(text(f"SELECT {JOB_COLUMNS} FROM pwh.import_jobs WHERE id = :id"), {"id": job_id}).mappings().first()
+    return dict(row) if row else None
+
+
+def find_job(engine: Engine, wb_hash: str) -> dict | None:
+    """
+    Job terakhir untuk workbook ini, ditambah flag 'resumable' (gagal, atau
+    'running' tanpa checkpoint selama STALE_AFTER detik -> proses terputus).
+    Job 'queued' (masih di antrean worker) tidak pernah resumable.
+    """
+    with engine.connect() as conn:
+        row = conn.execute(text(f"""
+            SELECT {JOB_COLUMNS}, (status = 'failed' OR (status = 'running' AND updated_at < now() - make_interval(secs => :stale))) AS resumable
+            FROM pwh.import_jobs WHERE workbook_hash = :hash ORDER BY id DESC LIMIT 1
+        """), {"hash": wb_hash, "stale": STALE_AFTER}).mappings().first()
+    return dict(row) if row else None
+
+
+def create_job(engine: Engine, wb_hash: str, rows_total: int, file_name: str | None = None,
+               chunk_rows: int = CHUNK_ROWS) -> int:
+    with engine.begin() as conn:
+        return int(conn.execute(text("""
+            INSERT INTO pwh.import_jobs (workbook_hash, file_name, status, chunk_rows, rows_total)
+            VALUES (:hash, :name, 'queued', :chunk_rows, :total) RETURNING id;
+        """), {"hash": wb_hash, "name": file_name, "chunk_rows": chunk_rows, "total": rows_total}).scalar())
+
+
+def _set_job_status(engine: Engine, job_id: int, status: str, error: str | None = None):
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE pwh.import_jobs SET status = :status, error = :error, updated_at = now() WHERE id = :id"),
+                     {"id": job_id, "status": status, "error": error})
+
+
+def _claim_job(engine: Engine, job_id: int) -> bool:
+    # Atomik: hanya satu proses yang bisa memindahkan job ke 'running'
+    with engine.begin() as conn:
+        return conn.execute(text("""
+            UPDATE pwh.import_jobs SET status = 'running', error = NULL, updated_at = now()
+            WHERE id = :id AND (status IN ('queued', 'failed')
+                                OR (status = 'running' AND updated_at < now() - make_interval(secs => :stale)))
+            RETURNING id;
+        """), {"id": job_id, "stale": STALE_AFTER}).first() is not None
+
+
+def run_import_job(engine: Engine, file, job_id: int,
+                   progress: Callable[[str, int, int], None] | None = None) -> dict:
+    """
+    Jalankan (atau lanjutkan) job import sampai selesai; dipakai dari worker
+    background. Status 'running' baru diset saat job benar-benar mulai; status
+    akhir ('done' / 'failed' + pesan) dicatat di pwh.import_jobs.
+    """
+    if not _claim_job(engine, job_id):
+        raise RuntimeError(f"Job import #{job_id} sedang dijalankan proses lain.")
+    try:
+        results = import_workbook(engine, file, job_id=job_id, progress=progress)
+    except Exception as e:
+        logger.warning("Import job %s gagal: %s", job_id, e)
+        _set_job_status(engine, job_id, "failed", str(e))
+        raise
+    _set_job_status(engine, job_id, "done")
+    return results
+
+# ------------------------------------------------------------------------------
+# Validasi sebelum import (tanpa menulis ke database)
+# ------------------------------------------------------------------------------
+MAX_REPORT_ROWS = 10000  # per sheet, agar workbook laporan tetap kecil
+
+# kolom -> (nama enum di schema pwh, nilai fallback jika enum tidak terbaca)
+ENUM_COLUMNS = {
+    "blood_group": ("blood_group_enum", ["A", "B", "AB", "O"]),
+    "rhesus": ("rhesus_enum", ["+", "-"]),
+    "education": ("education_enum", ["Tidak sekolah", "SD", "SMP", "SMA/SMK", "Diploma", "S1", "S2", "S3"]),
+    "hemo_type": ("hemo_type_enum", ["A", "B", "vWD", "Other"]),
+    "severity": ("severity_enum", ["Ringan", "Sedang", "Berat", "Tidak diketahui"]),
+    "factor": ("inhibitor_factor_enum", ["FVIII", "FIX"]),
+    "test_type": ("virus_test_enum", ["HBsAg", "Anti-HCV", "HIV"]),
+    "result": ("test_result_enum", ["positive", "negative", "indeterminate", "unknown"]),
+    "relation": ("relation_enum", ["ayah", "ibu", "wali", "pasien", "lainnya"]),
+}
+
+# Kolom teks dengan pilihan tetap (selectbox di form input)
+GENDER_CHOICES = ["Laki-laki", "Perempuan"]
+TREATMENT_TYPE_CHOICES = ["Prophylaxis", "On Demand"]
+CARE_SERVICE_CHOICES = ["Rawat Jalan", "Rawat Inap"]
+FIXED_COLUMNS = {
+    "gender": GENDER_CHOICES,
+    "treatment_type": TREATMENT_TYPE_CHOICES,
+    "care_services": CARE_SERVICE_CHOICES,
+}
+# Kolom `product` isian bebas di DB: daftar ini hanya saran dropdown template, tidak divalidasi
+PRODUCT_SUGGESTIONS = [
+    "Plasma (FFP)", "Cryoprecipitate", "Konsentrat (plasma derived)", "Konsentrat (rekombinan)",
+    "Konsentrat (prolonged half life)", "Prothrombin Complex", "DDAVP", "Emicizumab (Hemlibra)",
+    "Konsentrat Bypassing Agent",
+]
+
+# Kolom wajib per sheet (selain referensi pasien di sheet turunan)
+REQUIRED = {
+    "Pasien": ["full_name"],
+    "Diagnosa": ["hemo_type"],
+    "Virus Tes": ["test_type"],
+    "Kontak": ["name"],
+}
+
+KIND_LABELS = {"date": "tanggal", "int": "angka bulat", "num": "angka"}
+
+
+def load_choices(engine: Engine) -> dict[str, list[str]]:
+    """
+    Pilihan valid per kolom untuk validate_workbook: enum pwh.* (dengan fallback
+    seperti di form input) + FIXED_COLUMNS. Dipakai oleh UI maupun pwh_cli.
+    """
+    q = text("""
+        SELECT t.typname, e.enumlabel
+        FROM pg_type t JOIN pg_enum e ON t.oid = e.enumtypid JOIN pg_namespace n ON n.oid = t.typnamespace
+        WHERE n.nspname = 'pwh' AND t.typname = ANY(:types)
+        ORDER BY t.typname, e.enumsortorder;
+    """)
+    found: dict[str, list[str]] = {}
+    try:
+        with engine.connect() as conn:
+            for typ, label in conn.execute(q, {"types": [t for t, _ in ENUM_COLUMNS.values()]}):
+                found.setdefault(typ, []).append(label)
+    except Exception:
+        pass
+    choices = {col: found.get(typ) or fallback for col, (typ, fallback) in ENUM_COLUMNS.items()}
+    return {**choices, **FIXED_COLUMNS}
+
+
+def _existing_ids(conn, ids: list[int]) -> set[int]:
+    if not ids:
+        return set()
+    rows = conn.execute(text("SELECT id FROM pwh.patients WHERE id = ANY(:ids)"), {"ids": ids})
+    return {int(r[0]) for r in rows}
+
+
+def check_chunk(raw: pd.DataFrame, df: pd.DataFrame, label: str, choices: dict[str, list[str]],
+                conn, new_names: dict[str, int]) -> pd.Series:
+    """
+    Pesan kesalahan per baris ('' = valid) untuk satu chunk. Semua pemeriksaan
+    per kolom (vektor); database hanya ditanya sekali per chunk untuk id/nama pasien.
+    """
+    _, _, headers, columns = SHEETS[label]
+    header_of = {v: k for k, v in headers.items()}
+    errors = pd.Series("", index=df.index, dtype="object")
+
+    def flag(mask, msg):
+        mask = mask.fillna(False).astype(bool)
+        if mask.any():
+            if isinstance(msg, pd.Series):
+                msg = msg[mask]
+            errors[mask] = errors[mask] + msg + "; "
+
+    for col, kind in columns.items():
+        if col not in raw.columns:
+            continue
+        head = header_of.get(col, col)
+        filled = raw[col].notna() & raw[col].astype("string").str.strip().ne("")
+        if kind in KIND_LABELS:
+            flag(filled & df[col].isna(), f"{head}: bukan {KIND_LABELS[kind]} yang valid")
+        allowed = [c for c in choices.get(col) or [] if c]
+        if allowed:
+            bad = df[col].notna() & ~df[col].isin(allowed)
+            flag(bad, head + ": '" + df[col].astype("string") + "' tidak ada di pilihan")
+    for col in REQUIRED.get(label, []):
+        flag(df[col].isna(), f"{header_of.get(col, col)} wajib diisi")
+
+    if label != "Pasien":
+        has_id = df["patient_id"].notna()
+        ids = df.loc[has_id, "patient_id"].astype(int)
+        known_ids = _existing_ids(conn, sorted(set(ids.tolist())))
+        flag(has_id & ~df["patient_id"].isin(list(known_ids)), "patient_id tidak ditemukan")
+
+        keys = df["full_name"].str.lower()
+        by_name = ~has_id & keys.notna()
+        wanted = set(keys[by_name].tolist())
+        in_db = match_names(conn, sorted(wanted))
+        # Jumlah pasien yang cocok: di database + di sheet Pasien file ini
+        totals = {k: len(in_db.get(k, ())) + new_names.get(k, 0) for k in wanted}
+        hits = keys.map(totals).fillna(0).astype(int)
+        name = "Nama Lengkap '" + df["full_name"].astype("string") + "'"
+        flag(by_name & hits.eq(0), name + " tidak ditemukan")
+        flag(by_name & hits.gt(1), name + " ambigu (" + hits.astype("string") + " pasien), isi patient_id")
+        flag(~has_id & keys.isna(), "patient_id atau Nama Lengkap wajib diisi")
+    return errors
+
+
+def validate_workbook(engine: Engine, file, choices: dict[str, list[str]] | None = None,
+                      chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Validasi seluruh workbook dalam satu kali baca, tanpa menulis apa pun.
+    Return: {'rows': {label: jumlah baris}, 'errors': jumlah baris bermasalah,
+             'report': bytes workbook kesalahan (None jika valid)}.
+    """
+    choices = choices if choices is not None else load_choices(engine)
+    wb = open_workbook(file)
+    rows, bad_rows, n_errors = {}, {}, 0
+    new_names: dict[str, int] = {}  # nama lowercase di sheet Pasien -> jumlah baris
+    try:
+        with engine.connect() as conn:
+            for label, (_, _, headers, columns) in SHEETS.items():
+                rows[label] = 0
+                for raw in iter_sheet_chunks(wb, label, chunk_rows):
+                    df = coerce_frame(raw, columns)
+                    errors = check_chunk(raw, df, label, choices, conn, new_names)
+                    if label == "Pasien":
+                        for key, n in df["full_name"].dropna().str.lower().value_counts().items():
+                            new_names[key] = new_names.get(key, 0) + int(n)
+                    rows[label] += len(df)
+                    failed = errors.ne("")
+                    n_errors += int(failed.sum())
+                    if failed.any():
+                        kept = bad_rows.setdefault(label, [])
+                        room = MAX_REPORT_ROWS - sum(len(f) for f in kept)
+                        if room > 0:
+                            out = raw[failed].rename(columns={v: k for k, v in headers.items()})
+                            out.insert(0, "Kesalahan", errors[failed].str.rstrip("; "))
+                            out.insert(0, "Baris", out.index)
+                            kept.append(out.head(room))
+    finally:
+        wb.close()
+
+    report = None
+    if bad_rows:
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
+            for label, frames in bad_rows.items():
+                pd.concat(frames).to_excel(writer, sheet_name=label, index=False)
+        report = buf.getvalue()
+    return {"rows": rows, "errors": n_errors, "report": report}
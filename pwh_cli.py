@@ -0,0 +1,181 @@
+# pwh_cli.py (Import/export bulk dari command line, tanpa Streamlit)
+#
+# Untuk cron / pemindahan data besar tanpa menahan worker UI:
+#
+#   python pwh_cli.py import data.xlsx [--report kesalahan.xlsx] [--chunk-rows 5000]
+#   python pwh_cli.py export data_pwh.xlsx [--fresh]
+#   python pwh_cli.py export perubahan.xlsx --delta --user cabang_jabar [--since 2024-01-01]
+#
+# DSN dibaca dari environment DATABASE_URL (lihat pwh_db.py).
+# Exit code: 0 = berhasil, 1 = validasi gagal / error saat proses, 2 = konfigurasi / argumen.
+import argparse
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+
+from pwh_bulk import CHUNK_ROWS, create_job, find_job, load_choices, run_import_job, validate_workbook, workbook_hash
+from pwh_db import get_engine
+from pwh_export import advance_watermark, cached_export, delta_export, write_export
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_CONFIG = 2
+
+_print_lock = threading.Lock()
+
+
+def _say(msg: str):
+    with _print_lock:
+        print(msg, flush=True)
+
+
+def _engine():
+    try:
+        return get_engine()
+    except RuntimeError as e:
+        _say(f"Konfigurasi: {e} Set environment variable DATABASE_URL.")
+        return None
+
+
+# ------------------------------------------------------------------------------
+# import
+# ------------------------------------------------------------------------------
+def cmd_import(args) -> int:
+    path = args.file
+    if not os.path.isfile(path):
+        _say(f"File tidak ditemukan: {path}")
+        return EXIT_CONFIG
+    engine = _engine()
+    if engine is None:
+        return EXIT_CONFIG
+
+    wb_hash = workbook_hash(path)
+    job = find_job(engine, wb_hash)
+    if job and job["status"] == "done":
+        _say(f"Workbook ini sudah diimpor (job #{job['id']}, {job['rows_done']} baris).")
+        return EXIT_OK
+    if job and job["status"] in ("queued", "running") and not job["resumable"]:
+        _say(f"Workbook ini sedang diimpor / menunggu di antrean proses lain (job #{job['id']}).")
+        return EXIT_FAILED
+
+    if job and job["resumable"]:
+        # Baris yang sudah masuk akan membuat nama tampak ambigu -> validasi dilewati
+        job_id = job["id"]
+        rows_total = job["rows_total"]
+        _say(f"Melanjutkan job #{job_id} ({job['rows_done']}/{rows_total} baris sudah masuk).")
+    else:
+        _say("Validasi workbook...")
+        check = validate_workbook(engine, path, choices=load_choices(engine), chunk_rows=args.chunk_rows)
+        rows_total = sum(check["rows"].values())
+        for label, n in check["rows"].items():
+            _say(f"  {label}: {n} baris")
+        if check["errors"]:
+            report = args.report or f"{os.path.splitext(path)[0]}.kesalahan.xlsx"
+            with open(report, "wb") as f:
+                f.write(check["report"])
+            _say(f"{check['errors']} baris bermasalah, tidak ada data yang ditulis. Laporan: {report}")
+            return EXIT_FAILED
+        job_id = create_job(engine, wb_hash, rows_total, os.path.basename(path), args.chunk_rows)
+        _say(f"Job #{job_id} dibuat ({rows_total} baris).")
+
+    done = {"rows": 0}
+    started = time.monotonic()
+
+    def progress(label: str, chunk: int, rows: int):
+        with _print_lock:
+            done["rows"] += rows
+            print(f"  {label} chunk {chunk + 1}: +{rows} baris (sesi ini {done['rows']}/{rows_total})", flush=True)
+
+    try:
+        results = run_import_job(engine, path, job_id, progress=progress)
+    except Exception as e:
+        _say(f"Import gagal: {e}")
+        _say("Jalankan perintah yang sama lagi untuk melanjutkan dari checkpoint terakhir.")
+        return EXIT_FAILED
+    _say(f"Selesai dalam {time.monotonic() - started:.1f} detik. Baris masuk/diperbarui per sheet:")
+    for label, n in results.items():
+        _say(f"  {label}: {n}")
+    return EXIT_OK
+
+# ------------------------------------------------------------------------------
+# export
+# ------------------------------------------------------------------------------
+def cmd_export(args) -> int:
+    if args.delta and not args.user:
+        _say("--delta membutuhkan --user (pemilik watermark).")
+        return EXIT_CONFIG
+    engine = _engine()
+    if engine is None:
+        return EXIT_CONFIG
+    started = time.monotonic()
+    progress = lambda sheet, n: _say(f"  {sheet}: {n} baris")
+    tmp = f"{args.out}.{os.getpid()}.tmp"
+    info = None
+    try:
+        if args.delta:
+            with open(tmp, "wb") as f:
+                info = delta_export(engine, args.user, f, since=args.since, progress=progress)
+            since = f"{info['since']:%Y-%m-%d %H:%M:%S%z}" if info["since"] else "awal"
+            _say(f"Delta sejak {since}: {info['rows']} baris.")
+        elif args.fresh:
+            # Tulis ke file sementara dulu agar file tujuan tidak pernah setengah jadi
+            with open(tmp, "wb") as f:
+                write_export(engine, f, progress=progress)
+        else:
+            path, built = cached_export(engine, progress=progress)
+            if not built:
+                _say("Data belum berubah sejak export terakhir, memakai file cache.")
+            shutil.copyfile(path, tmp)
+        os.replace(tmp, args.out)
+    except Exception as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        _say(f"Export gagal: {e}")
+        return EXIT_FAILED
+    if info and info["advance"]:
+        # Baru setelah file tujuan lengkap; --since tidak mengubah watermark
+        advance_watermark(engine, args.user, info["until"], info["rows"])
+    _say(f"Export selesai dalam {time.monotonic() - started:.1f} detik: {args.out}")
+    return EXIT_OK
+
+
+def _timestamp(value: str) -> datetime:
+    try:
+        ts = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bukan tanggal/waktu ISO 8601: {value}")
+    return ts if ts.tzinfo else ts.astimezone()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="pwh_cli", description="Import/export bulk data PWH tanpa UI.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_imp = sub.add_parser("import", help="Import Template Bulk (.xlsx) ke database")
+    p_imp.add_argument("file", help="file Template Bulk (.xlsx)")
+    p_imp.add_argument("--report", help="lokasi laporan kesalahan validasi (default: <file>.kesalahan.xlsx)")
+    p_imp.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help=f"baris per chunk (default {CHUNK_ROWS})")
+    p_imp.set_defaults(func=cmd_import)
+
+    p_exp = sub.add_parser("export", help="Export semua data ke file Excel")
+    p_exp.add_argument("out", help="file tujuan (.xlsx)")
+    p_exp.add_argument("--fresh", action="store_true", help="bangun ulang tanpa memakai/menyimpan cache export")
+    p_exp.add_argument("--delta", action="store_true", help="hanya baris yang berubah sejak export delta terakhir --user")
+    p_exp.add_argument("--user", help="pemilik watermark export delta")
+    p_exp.add_argument("--since", type=_timestamp, help="mulai delta dari waktu ini (ISO 8601) alih-alih watermark; watermark tidak diubah")
+    p_exp.set_defaults(func=cmd_export)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,486 @@
+# pwh_export.py (Export Excel multi-sheet semua data PWH)
+#
+# Tanpa streamlit: dipakai oleh halaman input (tab Export) dan oleh pwh_cli.py
+# untuk export terjadwal dari cron.
+#
+# Export dialirkan: setiap query dibaca per chunk dari server-side cursor dan
+# ditulis dengan mode constant_memory xlsxwriter ke file sementara, sehingga
+# pemakaian memori tidak tumbuh mengikuti ukuran database. Query per sheet
+# diambil paralel di beberapa koneksi yang berbagi satu snapshot transaksi
+# (pg_export_snapshot), jadi semua sheet mencerminkan titik waktu yang sama.
+# Export delta hanya berisi baris yang berubah sejak watermark per user.
+# File hasil disimpan di .cache/exports/ dengan nama sidik jari versi data
+# (pwh.data_version); klik berikutnya memakai file yang sama selama data belum berubah.
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import time
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator
+
+import pandas as pd
+import xlsxwriter
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from pwh_db import data_version
+
+EXPORT_CHUNK_ROWS = 5000               # baris per fetch dari server-side cursor
+WIDTH_SAMPLE_ROWS = 1000               # baris pertama per sheet untuk menghitung lebar kolom
+SHEET_SPOOL_BYTES = 1024 * 1024        # per sheet saat fetch paralel; batas memori total ~ jumlah sheet x nilai ini
+EXPORT_WORKERS = 4                     # query export yang berjalan bersamaan (+1 koneksi pemegang snapshot)
+
+CACHE_DIR = os.environ.get("PWH_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+EXPORT_CACHE_DIR = os.path.join(CACHE_DIR, "exports")
+EXPORT_CACHE_KEEP = 3                  # file export terbaru yang disimpan
+EXPORT_FORMAT = 1                      # naikkan jika query/format export berubah (membatalkan cache lama)
+DELTA_DIR = os.path.join(CACHE_DIR, "delta")
+DELTA_TTL = 3600                       # detik sebelum file delta yang tidak diambil dihapus
+EXPORT_TABLES = [
+    "pwh.patients", "pwh.hemo_diagnoses", "pwh.hemo_inhibitors", "pwh.virus_tests",
+    "pwh.treatment_hospital", "pwh.death", "pwh.contacts",
+]
+
+logger = logging.getLogger("pwh_export")
+
+_locks_guard = threading.Lock()
+_build_locks: dict[str, threading.Lock] = {}
+
+# ------------------------------------------------------------------------------
+# Alias kolom (nama tampilan Bahasa Indonesia)
+# ------------------------------------------------------------------------------
+ALIAS_PATIENTS = {"full_name": "Nama Lengkap","birth_place": "Tempat Lahir","birth_date": "Tanggal Lahir", "nik": "NIK", "age_years": "Umur (tahun)", "blood_group": "Gol. Darah","rhesus": "Rhesus", "gender": "Jenis Kelamin", "occupation": "Pekerjaan", "education": "Pendidikan Terakhir", "address": "Alamat", "village": "Kelurahan/Desa", "district": "Kecamatan", "phone": "No. Ponsel","province": "Propinsi","city": "Kabupaten/Kota", "cabang": "HMHI Cabang", "kota_cakupan": "Kota Cakupan Cabang", "note": "Catatan", "created_at": "Dibuat"}
+ALIAS_DIAG = {"full_name": "Nama Lengkap","hemo_type": "Jenis Hemofilia","severity": "Kategori","diagnosed_on": "Tgl Diagnosis","source": "Sumber"}
+ALIAS_INH = {"full_name": "Nama Lengkap","factor": "Faktor","titer_bu": "Titer (BU)","measured_on": "Tgl Ukur","lab": "Lab"}
+ALIAS_VIRUS = {"full_name": "Nama Lengkap","test_type": "Jenis Tes","result": "Hasil","tested_on": "Tgl Tes","lab": "Lab"}
+ALIAS_HOSPITAL = {"full_name": "Nama Lengkap","name_hospital": "Nama RS","city_hospital": "Kota RS","province_hospital": "Provinsi RS", "date_of_visit": "Tanggal Kunjungan", "doctor_in_charge": "DPJP", "treatment_type": "Jenis Penanganan","care_services": "Layanan Rawat","frequency": "Frekuensi","dose": "Dosis","product": "Produk","merk": "Merk"}
+ALIAS_DEATH = {"full_name": "Nama Lengkap", "cause_of_death": "Penyebab Kematian", "year_of_death": "Tahun Kematian"}
+ALIAS_CONTACTS = {"full_name": "Nama Lengkap","relation": "Relasi","name": "Nama Kontak","phone": "No. Telp","is_primary": "Primary"}
+ALIAS_SUMMARY = {"Nama Lengkap": "Nama Lengkap","Lahir: Tempat": "Tempat Lahir","Lahir: Tanggal": "Tanggal Lahir","Gol. Darah": "Gol. Darah","Rhesus": "Rhesus","Pekerjaan": "Pekerjaan","vWD": "vWD","Kategori Hemofilia A": "Kategori A","Kategori Hemofilia B": "Kategori B","Inhibitor FVIII (BU)": "FVIII (BU)","Inhibitor FIX (BU)": "FIX (BU)","HBsAg": "HBsAg","Anti HCV": "Anti-HCV","HIV": "HIV","Alamat": "Alamat","No. Telp": "No. Telp","Org Tua: Ayah": "Ayah","Org Tua: Ibu": "Ibu","Umur (tahun)": "Umur"}
+
+
+def alias_df(df: pd.DataFrame, alias_map: dict) -> pd.DataFrame:
+    if df is None or df.empty: return df
+    return df.rename(columns={c: alias_map.get(c, c) for c in df.columns})
+
+# ------------------------------------------------------------------------------
+# Query per sheet (nama sheet Bahasa Indonesia, urutan = urutan sheet di file).
+# `{where}` kosong untuk export penuh, atau filter updated_at untuk export delta.
+# ------------------------------------------------------------------------------
+EXPORT_SHEETS = {
+    "Pasien": ("""
+        SELECT
+            p.id, p.full_name, p.birth_place, p.birth_date, p.nik,
+            COALESCE(pa.age_years, EXTRACT(YEAR FROM age(CURRENT_DATE, p.birth_date))) AS age_years,
+            p.blood_group, p.rhesus, p.gender, p.occupation, p.education, p.address,
+            p.village, p.district, p.phone, p.province, p.city, p.cabang, p.kota_cakupan,
+            p.note, p.created_at
+        FROM pwh.patients p
+        LEFT JOIN pwh.patient_age pa ON pa.id = p.id
+        {where}
+        ORDER BY p.id
+    """, ALIAS_PATIENTS),
+    "Diagnosa": ("""
+        SELECT d.id, d.patient_id, p.full_name, d.hemo_type, d.severity, d.diagnosed_on, d.source
+        FROM pwh.hemo_diagnoses d JOIN pwh.patients p ON p.id = d.patient_id
+        {where}
+        ORDER BY d.patient_id, d.id
+    """, ALIAS_DIAG),
+    "Inhibitor": ("""
+        SELECT i.id, i.patient_id, p.full_name, i.factor, i.titer_bu, i.measured_on, i.lab
+        FROM pwh.hemo_inhibitors i JOIN pwh.patients p ON p.id = i.patient_id
+        {where}
+        ORDER BY i.patient_id, i.measured_on NULLS LAST, i.id
+    """, ALIAS_INH),
+    "Virus Tes": ("""
+        SELECT v.id, v.patient_id, p.full_name, v.test_type, v.result, v.tested_on, v.lab
+        FROM pwh.virus_tests v JOIN pwh.patients p ON p.id = v.patient_id
+        {where}
+        ORDER BY v.patient_id, v.tested_on NULLS LAST, v.id
+    """, ALIAS_VIRUS),
+    "RS Penangan": ("""
+        SELECT th.id, th.patient_id, p.full_name, th.name_hospital, th.city_hospital, th.province_hospital,
+               th.date_of_visit, th.doctor_in_charge, th.treatment_type, th.care_services, th.frequency, th.dose, th.product, th.merk
+        FROM pwh.treatment_hospital th JOIN pwh.patients p ON p.id = th.patient_id
+        {where}
+        ORDER BY th.patient_id, th.id
+    """, ALIAS_HOSPITAL),
+    "Kematian": ("""
+        SELECT d.id, d.patient_id, p.full_name, d.cause_of_death, d.year_of_death
+        FROM pwh.death d JOIN pwh.patients p ON p.id = d.patient_id
+        {where}
+        ORDER BY d.patient_id, d.id
+    """, ALIAS_DEATH),
+    "Kontak": ("""
+        SELECT c.id, c.patient_id, p.full_name, c.relation, c.name, c.phone, c.is_primary
+        FROM pwh.contacts c JOIN pwh.patients p ON p.id = c.patient_id
+        {where}
+        ORDER BY c.patient_id, c.id
+    """, ALIAS_CONTACTS),
+    "Ringkasan Pasien": ("SELECT * FROM pwh.patient_summary {where} ORDER BY id", ALIAS_SUMMARY),
+}
+
+
+
+def _width(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (date, datetime)):
+        return 10  # yyyy-mm-dd
+    return len(str(value))
+
+# ------------------------------------------------------------------------------
+# Builder file Excel (streaming)
+# ------------------------------------------------------------------------------
+def _write_head(ws, header: list[str], sample: list) -> int:
+    """Atur lebar kolom dari sampel, lalu tulis header + baris sampel. Return: jumlah baris sampel."""
+    widths = [len(h) for h in header]
+    for row in sample:
+        widths = [max(w, _width(v)) for w, v in zip(widths, row)]
+    for col_idx, w in enumerate(widths):
+        ws.set_column(col_idx, col_idx, min(w + 2, 50))
+    ws.write_row(0, 0, header)
+    for i, row in enumerate(sample, start=1):
+        ws.write_row(i, 0, row)
+    return len(sample)
+
+
+def _write_sheet(wb: xlsxwriter.Workbook, sheet: str, keys: list[str], chunks: Iterable[list],
+                 alias: dict, progress: Callable[[str, int], None] | None = None) -> int:
+    """
+    Tulis baris dari `chunks` (list baris per chunk) ke satu worksheet. Mode
+    constant_memory membuang setiap baris setelah ditulis, jadi baris harus
+    ditulis berurutan. Lebar kolom dihitung dari WIDTH_SAMPLE_ROWS baris pertama saja.
+    Return: jumlah baris data.
+    """
+    ws = wb.add_worksheet(sheet)
+    header = [alias.get(c, c) for c in keys]
+    sample: list | None = []
+    n = 0
+    for chunk in chunks:
+        if sample is not None:
+            take = WIDTH_SAMPLE_ROWS - len(sample)
+            sample += chunk[:take]
+            chunk = chunk[take:]
+            if len(sample) < WIDTH_SAMPLE_ROWS:
+                continue
+            n = _write_head(ws, header, sample)
+            sample = None
+        for row in chunk:
+            n += 1
+            ws.write_row(n, 0, row)
+        if progress:
+            progress(sheet, n)
+    if sample is not None:
+        n = _write_head(ws, header, sample)
+        if progress:
+            progress(sheet, n)
+    return n
+
+
+def _stream(conn, sql: str, params: dict | None = None):
+    """(nama kolom, iterator chunk) dari server-side cursor, EXPORT_CHUNK_ROWS baris per chunk."""
+    result = conn.execution_options(yield_per=EXPORT_CHUNK_ROWS).execute(text(sql), params or {})
+    return list(result.keys()), result.partitions()
+
+# ------------------------------------------------------------------------------
+# Fetch paralel dalam satu snapshot
+# ------------------------------------------------------------------------------
+def _spool_query(engine: Engine, sql: str, snapshot: str):
+    """
+    Jalankan `sql` di koneksi pool sendiri yang memakai snapshot transaksi
+    `snapshot`, lalu tampung hasilnya (pickle per chunk) di file sementara.
+    Return: (nama kolom, spool dalam posisi awal).
+    """
+    # Ambang kecil: sheet yang selesai duluan menunggu giliran ditulis di disk, bukan di memori
+    spool = tempfile.SpooledTemporaryFile(max_size=SHEET_SPOOL_BYTES)
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            conn.execute(text("SET TRANSACTION SNAPSHOT :snap"), {"snap": snapshot})
+            keys, chunks = _stream(conn, sql)
+            for chunk in chunks:
+                pickle.dump([tuple(row) for row in chunk], spool, protocol=pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return keys, spool
+
+
+def _read_spool(spool) -> Iterator[list]:
+    while True:
+        try:
+            yield pickle.load(spool)
+        except EOFError:
+            return
+
+
+def _write_parallel(wb: xlsxwriter.Workbook, engine: Engine, progress: Callable[[str, int], None] | None):
+    # Transaksi "pemimpin" mengekspor snapshot dan tetap terbuka sampai semua
+    # worker selesai mengimpornya; setiap sheet lalu melihat data yang sama persis.
+    with engine.connect() as leader:
+        leader.exec_driver_sql("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        snapshot = leader.execute(text("SELECT pg_export_snapshot()")).scalar()
+        with ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="pwh-export") as pool:
+            futures = {
+                sheet: pool.submit(_spool_query, engine, sql.format(where=""), snapshot)
+                for sheet, (sql, _) in EXPORT_SHEETS.items()
+            }
+            try:
+                # Sheet ditulis berurutan begitu hasilnya siap; sisanya tetap diambil paralel
+                for sheet, (_, alias) in EXPORT_SHEETS.items():
+                    keys, spool = futures[sheet].result()
+                    with spool:
+                        _write_sheet(wb, sheet, keys, _read_spool(spool), alias, progress)
+            except BaseException:
+                for future in futures.values():
+                    if not future.cancel() and future.done() and future.exception() is None:
+                        future.result()[1].close()
+                raise
+
+# ------------------------------------------------------------------------------
+# API
+# ------------------------------------------------------------------------------
+def _open_workbook(out) -> xlsxwriter.Workbook:
+    return xlsxwriter.Workbook(out, {
+        "constant_memory": True,
+        "default_date_format": "yyyy-mm-dd",
+        "remove_timezone": True,  # xlsxwriter tidak mendukung datetime 'timezone-aware'
+        "nan_inf_to_errors": True,
+    })
+
+
+def write_export(engine: Engine, out, progress: Callable[[str, int], None] | None = None):
+    """
+    Tulis file Excel berisi semua data ke `out` (path atau file-like) tanpa
+    memuat tabel ke memori. Di PostgreSQL kedelapan query dijalankan paralel
+    (EXPORT_WORKERS koneksi) dalam satu snapshot sehingga antar sheet konsisten.
+    `progress(sheet, jumlah_baris)` dipanggil setelah setiap chunk ditulis.
+    """
+    wb = _open_workbook(out)
+    try:
+        if engine.dialect.name == "postgresql" and EXPORT_WORKERS > 1:
+            _write_parallel(wb, engine, progress)
+        else:
+            for sheet, (sql, alias) in EXPORT_SHEETS.items():
+                with engine.connect() as conn:
+                    keys, chunks = _stream(conn, sql.format(where=""))
+                    _write_sheet(wb, sheet, keys, chunks, alias, progress)
+    finally:
+        wb.close()
+
+
+# ------------------------------------------------------------------------------
+# Cache file export di disk
+# ------------------------------------------------------------------------------
+def export_fingerprint(engine: Engine) -> str | None:
+    """
+    Sidik jari isi export: versi data semua tabel sumber + tanggal hari ini
+    (kolom umur dihitung dari CURRENT_DATE). None jika pwh.data_version tidak
+    tersedia (export selalu dibangun ulang).
+    """
+    version = data_version(engine, EXPORT_TABLES)
+    if version.startswith("nocache:"):
+        return None
+    key = f"{EXPORT_FORMAT}|{date.today().isoformat()}|{version}"
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def _prune_exports(keep_path: str):
+    try:
+        files = [os.path.join(EXPORT_CACHE_DIR, n) for n in os.listdir(EXPORT_CACHE_DIR) if n.endswith(".xlsx")]
+    except OSError:
+        return
+    files.sort(key=lambda f: os.path.getmtime(f) if os.path.exists(f) else 0, reverse=True)
+    for old in files[EXPORT_CACHE_KEEP:]:
+        if old != keep_path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def cached_export(engine: Engine, progress: Callable[[str, int], None] | None = None) -> tuple[str, bool]:
+    """
+    Path file export untuk versi data saat ini, dibangun hanya jika belum ada
+    di EXPORT_CACHE_DIR. Permintaan bersamaan untuk versi yang sama di proses
+    ini menunggu satu build yang sama.
+    Return: (path, True jika file baru saja dibangun).
+    """
+    fp = export_fingerprint(engine)
+    name = fp or f"nocache-{uuid.uuid4().hex}"
+    path = os.path.join(EXPORT_CACHE_DIR, f"{name}.xlsx")
+    if fp and os.path.exists(path):
+        return path, False
+
+    with _locks_guard:
+        lock = _build_locks.setdefault(name, threading.Lock())
+    with lock:
+        if fp and os.path.exists(path):
+            return path, False
+        os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                write_export(engine, f, progress)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    with _locks_guard:
+        _build_locks.pop(name, None)
+    _prune_exports(path)
+    logger.info("Export dibangun: %s", path)
+    return path, True
+
+# ------------------------------------------------------------------------------
+# Export delta (sql/008_delta_export.sql)
+# ------------------------------------------------------------------------------
+# Kolom updated_at per sheet; Ringkasan Pasien tidak ikut (turunan dari sheet lain)
+DELTA_FILTERS = {
+    "Pasien": "p.updated_at",
+    "Diagnosa": "d.updated_at",
+    "Inhibitor": "i.updated_at",
+    "Virus Tes": "v.updated_at",
+    "RS Penangan": "th.updated_at",
+    "Kematian": "d.updated_at",
+    "Kontak": "c.updated_at",
+}
+DELETED_SHEET = "Dihapus"
+ALIAS_DELETED = {"table_name": "Tabel", "row_id": "id", "patient_id": "patient_id", "deleted_at": "Dihapus Pada"}
+DELETED_SQL = """
+    SELECT table_name, row_id, patient_id, deleted_at
+    FROM pwh.deleted_rows
+    WHERE deleted_at > :since
+    ORDER BY deleted_at, id
+"""
+
+# Watermark baru = awal transaksi export, dimundurkan ke awal transaksi lain yang
+# masih terbuka di database ini. Transaksi yang belum menulis pun ikut: jika nanti
+# menulis, updated_at-nya = now() transaksi itu (sebelum watermark), padahal barisnya
+# belum terlihat di snapshot ini, jadi harus ikut di delta berikutnya.
+WATERMARK_SQL = """
+    SELECT now(), min(xact_start),
+           count(*) FILTER (WHERE state IS NULL)  -- sesi role lain yang tidak boleh kita baca
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND pid <> pg_backend_pid() AND backend_type = 'client backend'
+"""
+# Jika ada sesi yang xact_start-nya tidak terbaca (tanpa hak pg_read_all_stats),
+# watermark dimundurkan sebesar ini sebagai batas aman.
+WATERMARK_MARGIN = timedelta(minutes=15)
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def get_watermark(engine: Engine, user: str) -> datetime | None:
+    """Waktu export delta terakhir `user` (None jika belum pernah)."""
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT exported_at FROM pwh.export_watermarks WHERE user_name = :user"), {"user": user}
+        ).scalar()
+
+
+def _watermark(conn) -> datetime:
+    now, oldest, hidden = conn.execute(text(WATERMARK_SQL)).one()
+    watermark = min(now, oldest) if oldest is not None else now
+    if hidden:
+        logger.warning(
+            "Export delta: xact_start %d sesi tidak terbaca (role tanpa pg_read_all_stats); "
+            "watermark dimundurkan %s.", hidden, WATERMARK_MARGIN)
+        watermark -= WATERMARK_MARGIN
+    return watermark
+
+
+def write_delta_export(engine: Engine, out, since: datetime | None,
+                       progress: Callable[[str, int], None] | None = None) -> tuple[datetime, int]:
+    """
+    Tulis file Excel berisi baris yang ditambah/diubah setelah `since` (None =
+    semua), ditambah sheet 'Dihapus' berisi tombstone baris yang dihapus.
+    Semua sheet dibaca dalam satu transaksi REPEATABLE READ.
+    Return: (watermark untuk delta berikutnya, jumlah baris).
+    """
+    params = {"since": since or EPOCH}
+    total = 0
+    wb = _open_workbook(out)
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            watermark = _watermark(conn)
+            for sheet, column in DELTA_FILTERS.items():
+                sql, alias = EXPORT_SHEETS[sheet]
+                keys, chunks = _stream(conn, sql.format(where=f"WHERE {column} > :since"), params)
+                total += _write_sheet(wb, sheet, keys, chunks, alias, progress)
+            keys, chunks = _stream(conn, DELETED_SQL, params)
+            total += _write_sheet(wb, DELETED_SHEET, keys, chunks, ALIAS_DELETED, progress)
+    finally:
+        wb.close()
+    return watermark, total
+
+
+def delta_export(engine: Engine, user: str, out, since: datetime | None = None,
+                 progress: Callable[[str, int], None] | None = None) -> dict:
+    """
+    Export delta untuk `user` sejak watermark terakhirnya (atau sejak `since`
+    jika diberikan). Watermark TIDAK dimajukan di sini: panggil
+    advance_watermark() setelah file benar-benar diserahkan ke user.
+    Return: {'since', 'until', 'rows', 'advance'}; 'advance' False jika `since`
+    diberikan (export dengan tanggal sendiri tidak mengubah watermark).
+    """
+    advance = since is None
+    if advance:
+        since = get_watermark(engine, user)
+    watermark, rows = write_delta_export(engine, out, since, progress)
+    return {"since": since, "until": watermark, "rows": rows, "advance": advance}
+
+
+def advance_watermark(engine: Engine, user: str, until: datetime, rows: int):
+    """Simpan watermark export delta `user` (tidak pernah mundur)."""
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO pwh.export_watermarks (user_name, exported_at, rows)
+            VALUES (:user, :at, :rows)
+            ON CONFLICT (user_name) DO UPDATE
+            SET exported_at = GREATEST(pwh.export_watermarks.exported_at, EXCLUDED.exported_at),
+                rows = EXCLUDED.rows, updated_at = now();
+        """), {"user": user, "at": until, "rows": rows})
+
+
+def _prune_delta_files(ttl: int = DELTA_TTL):
+    cutoff = time.time() - ttl
+    try:
+        names = os.listdir(DELTA_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(DELTA_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def delta_export_file(engine: Engine, user: str, since: datetime | None = None) -> dict:
+    """
+    delta_export() ke file baru di DELTA_DIR (dipakai job background halaman
+    input). Return: info delta_export + 'path'. Pemanggil menghapus file setelah
+    diserahkan; file yang tertinggal dihapus setelah DELTA_TTL.
+    """
+    _prune_delta_files()
+    os.makedirs(DELTA_DIR, exist_ok=True)
+    path = os.path.join(DELTA_DIR, f"{uuid.uuid4().hex}.xlsx")
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            info = delta_export(engine, user, f, since=since)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return {**info, "path": path}
@@ -0,0 +1,83 @@
+# pwh_jobs.py (Worker background untuk pekerjaan panjang: import/export)
+#
+# Satu ThreadPoolExecutor terbatas per proses. Pekerjaan didaftarkan dengan key
+# unik; key yang masih berjalan tidak dijalankan dua kali (mis. tombol diklik
+# ulang di rerun berikutnya). Status yang perlu bertahan lintas proses/restart
+# (mis. progres import) disimpan oleh pekerjaannya sendiri di database.
+# Entri job dihapus dari registry setelah hasilnya dibaca (result), langsung
+# saat selesai untuk job tanpa hasil (keep_result=False), atau setelah
+# RESULT_TTL detik jika hasilnya tidak pernah diambil.
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+MAX_WORKERS = int(os.environ.get("PWH_JOB_WORKERS") or 2)
+RESULT_TTL = 3600  # detik hasil job yang tidak diambil disimpan
+
+logger = logging.getLogger("pwh_jobs")
+
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="pwh-job")
+_futures: dict[str, Future] = {}
+_finished: dict[str, float] = {}  # key -> waktu selesai (monotonic)
+
+
+def _on_done(key: str, future: Future, keep_result: bool):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Job '%s' gagal: %s", key, future.exception())
+    with _lock:
+        if _futures.get(key) is not future:
+            return
+        if keep_result:
+            _finished[key] = time.monotonic()
+        else:
+            del _futures[key]
+
+
+def _prune_locked():
+    cutoff = time.monotonic() - RESULT_TTL
+    for key, done_at in list(_finished.items()):
+        if done_at < cutoff:
+            del _finished[key]
+            _futures.pop(key, None)
+
+
+def submit(key: str, fn: Callable, *args, keep_result: bool = True, **kwargs) -> bool:
+    """
+    Jalankan `fn(*args, **kwargs)` di background. False jika `key` masih berjalan.
+    keep_result=False untuk job yang hasilnya tidak akan dibaca lewat result()
+    (mis. import, progresnya dicatat di database).
+    """
+    with _lock:
+        _prune_locked()
+        current = _futures.get(key)
+        if current is not None and not current.done():
+            return False
+        future = _executor.submit(fn, *args, **kwargs)
+        _futures[key] = future
+        _finished.pop(key, None)
+    future.add_done_callback(lambda f: _on_done(key, f, keep_result))
+    return True
+
+
+def is_running(key: str) -> bool:
+    with _lock:
+        future = _futures.get(key)
+    return future is not None and not future.done()
+
+
+def result(key: str):
+    """
+    Hasil job yang sudah selesai (raise exception-nya jika gagal); None jika
+    belum ada/selesai. Entri job dihapus setelah dibaca: simpan hasilnya sendiri.
+    """
+    with _lock:
+        future = _futures.get(key)
+        if future is None or not future.done():
+            return None
+        del _futures[key]
+        _finished.pop(key, None)
+    return future.result()
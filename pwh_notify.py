@@ -0,0 +1,110 @@
+# pwh_notify.py (Invalidasi cache lintas proses via Postgres LISTEN/NOTIFY)
+#
+# Trigger di sql/002_change_notify.sql mengirim NOTIFY ke channel `pwh_changes`
+# dengan payload 'schema.tabel' setiap kali tabel berubah. Satu thread listener
+# per proses menerima notifikasi tersebut dan memanggil callback (biasanya
+# `fungsi_cache.clear`) yang terdaftar untuk tabel itu. Perubahan dari halaman
+# input, bulk import, maupun tool luar langsung terlihat di semua replika.
+#
+# Catatan: LISTEN butuh koneksi session (koneksi langsung / pooler mode session),
+# bukan pooler mode transaction.
+import logging
+import select
+import threading
+import time
+from typing import Callable, Iterable
+
+from sqlalchemy.engine import Engine
+
+CHANNEL = "pwh_changes"
+RECONNECT_DELAY = 5   # detik
+POLL_TIMEOUT = 30     # detik
+
+logger = logging.getLogger("pwh_notify")
+
+_lock = threading.Lock()
+_subscriptions: dict[str, tuple[frozenset, Callable[[], None]]] = {}
+_listener: threading.Thread | None = None
+_state: dict = {"connected": False, "last_event": None, "error": None}
+
+
+def subscribe(key: str, tables: Iterable[str], callback: Callable[[], None]):
+    """
+    Daftarkan `callback` untuk dipanggil saat salah satu `tables` berubah.
+    `key` unik per cache; mendaftar ulang dengan key yang sama (mis. di setiap
+    rerun halaman) hanya mengganti entri lama.
+    """
+    with _lock:
+        _subscriptions[key] = (frozenset(tables), callback)
+
+
+def _dispatch(table: str):
+    with _lock:
+        targets = [(k, cb) for k, (tables, cb) in _subscriptions.items() if table in tables]
+    for key, cb in targets:
+        try:
+            cb()
+        except Exception as e:
+            logger.warning("Callback invalidasi '%s' gagal: %s", key, e)
+
+
+def _connect(engine: Engine):
+    # Koneksi DBAPI terpisah dari pool: LISTEN menahan koneksi selamanya
+    cargs, cparams = engine.dialect.create_connect_args(engine.url)
+    conn = engine.dialect.loaded_dbapi.connect(*cargs, **cparams)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {CHANNEL};")
+    return conn
+
+
+def _listen_loop(engine: Engine):
+    reconnect = False
+    while True:
+        conn = None
+        try:
+            conn = _connect(engine)
+            _state.update(connected=True, error=None)
+            if reconnect:
+                # Event yang terlewat selama terputus tidak bisa diketahui:
+                # anggap semua tabel berubah.
+                with _lock:
+                    all_tables = {t for tables, _ in _subscriptions.values() for t in tables}
+                for table in all_tables:
+                    _dispatch(table)
+            reconnect = True
+            while True:
+                if select.select([conn], [], [], POLL_TIMEOUT) == ([], [], []):
+                    continue
+                conn.poll()
+                changed = set()
+                while conn.notifies:
+                    changed.add(conn.notifies.pop(0).payload)
+                for table in changed:
+                    _dispatch(table)
+                _state["last_event"] = time.time()
+        except Exception as e:
+            _state.update(connected=False, error=str(e))
+            logger.warning("Listener %s terputus: %s", CHANNEL, e)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        time.sleep(RECONNECT_DELAY)
+
+
+def start_listener(engine: Engine):
+    """Jalankan thread listener (sekali per proses; panggilan berikutnya diabaikan)."""
+    global _listener
+    with _lock:
+        if _listener is not None and _listener.is_alive():
+            return
+        _listener = threading.Thread(target=_listen_loop, args=(engine,), name="pwh-notify", daemon=True)
+        _listener.start()
+
+
+def listener_status() -> dict:
+    """Status listener: {'connected', 'last_event', 'error'}."""
+    return dict(_state)
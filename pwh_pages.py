@@ -0,0 +1,148 @@
+# pwh_pages.py (Loader halaman untuk main.py)
+#
+# Pengganti runpy.run_path per rerun. Setiap file halaman dibaca dan dikompilasi
+# sekali per proses (dikompilasi ulang hanya jika mtime file berubah). Statement
+# top-level yang berupa import / def / class dipisah ke code object "definisi"
+# yang dijalankan sekali per sesi; sisanya ("body") dijalankan di setiap rerun
+# dalam namespace yang sama. Akibatnya import tidak diulang dan fungsi (termasuk
+# yang dibungkus st.cache_*) tetap objek yang sama antar rerun.
+import ast
+import builtins
+import os
+import threading
+from typing import MutableMapping
+
+_HOISTABLE = (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+_BUILTINS = frozenset(dir(builtins))
+
+_lock = threading.Lock()
+_pages: dict[str, "CompiledPage"] = {}
+
+
+def _bound_names(stmt: ast.stmt) -> set[str]:
+    """Nama yang di-bind oleh satu statement top-level yang bisa di-hoist."""
+    if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+        return {(a.asname or a.name).split(".")[0] for a in stmt.names}
+    return {stmt.name}
+
+
+def _loads(nodes) -> set[str]:
+    return {n.id for node in nodes if node is not None for n in ast.walk(node) if isinstance(n, ast.Name)}
+
+
+def _def_time_names(stmt: ast.stmt) -> set[str]:
+    """Nama yang dievaluasi saat def/class dieksekusi (decorator, default, anotasi, base)."""
+    if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+        return set()
+    nodes = list(stmt.decorator_list)
+    if isinstance(stmt, ast.ClassDef):
+        nodes += stmt.bases + [k.value for k in stmt.keywords]
+        # Isi class dieksekusi langsung; isi method tidak
+        for child in stmt.body:
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                nodes += _def_time_nodes(child)
+            else:
+                nodes.append(child)
+    else:
+        nodes += _def_time_nodes(stmt)
+    return _loads(nodes)
+
+
+def _def_time_nodes(fn) -> list:
+    a = fn.args
+    args = a.posonlyargs + a.args + a.kwonlyargs + [a.vararg, a.kwarg]
+    return list(fn.decorator_list) + a.defaults + [d for d in a.kw_defaults if d] + \
+        [x.annotation for x in args if x is not None] + [fn.returns]
+
+
+def _split(tree: ast.Module) -> tuple[list[ast.stmt], list[ast.stmt], frozenset]:
+    """
+    Pisahkan statement yang aman dijalankan sekali (definisi) dari body.
+    Definisi di-hoist hanya jika: nama yang dievaluasi saat definisi hanya
+    merujuk ke import/definisi sebelumnya atau builtin, namanya tidak di-bind
+    ulang di tempat lain pada top-level, dan bukan `import *`.
+    """
+    counts: dict[str, int] = {}
+    for stmt in tree.body:
+        if isinstance(stmt, _HOISTABLE):
+            for name in _bound_names(stmt):
+                counts[name] = counts.get(name, 0) + 1
+        else:
+            for n in ast.walk(stmt):
+                if isinstance(n, ast.Name) and isinstance(n.ctx, (ast.Store, ast.Del)):
+                    counts[n.id] = counts.get(n.id, 0) + 2
+                elif isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    counts[n.name] = counts.get(n.name, 0) + 2
+                elif isinstance(n, (ast.Import, ast.ImportFrom)):
+                    for a in n.names:
+                        name = (a.asname or a.name).split(".")[0]
+                        counts[name] = counts.get(name, 0) + 2
+
+    defs, body, hoisted = [], [], set()
+    for stmt in tree.body:
+        if (
+            isinstance(stmt, _HOISTABLE)
+            and not (isinstance(stmt, ast.ImportFrom) and any(a.name == "*" for a in stmt.names))
+            and all(counts.get(name) == 1 for name in _bound_names(stmt))
+            and _def_time_names(stmt) <= (hoisted | _BUILTINS)
+        ):
+            defs.append(stmt)
+            hoisted |= _bound_names(stmt)
+        else:
+            body.append(stmt)
+    return defs, body, frozenset(hoisted)
+
+
+class CompiledPage:
+    """Satu file halaman yang sudah dikompilasi (definisi + body)."""
+
+    def __init__(self, path: str, mtime: float):
+        self.path = path
+        self.mtime = mtime
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), filename=path)
+        defs, body, self.hoisted = _split(tree)
+        self.defs_code = compile(ast.Module(body=defs, type_ignores=[]), path, "exec")
+        self.body_code = compile(ast.Module(body=body, type_ignores=[]), path, "exec")
+
+    def _new_namespace(self) -> dict:
+        ns = {"__name__": "__main__", "__file__": self.path, "__builtins__": builtins}
+        exec(self.defs_code, ns)
+        return ns
+
+    def run(self, store: MutableMapping):
+        """
+        Jalankan halaman. Namespace (berisi definisi) disimpan di `store`
+        (st.session_state) agar tiap sesi punya global sendiri: body halaman
+        menulis variabel global seperti `engine` atau state form, yang tidak
+        boleh saling timpa antar sesi yang berjalan paralel.
+        """
+        slot = f"_page_ns::{self.path}"
+        entry = store.get(slot)
+        if entry is None or entry[0] is not self:
+            ns = self._new_namespace()
+            store[slot] = (self, ns)
+        else:
+            ns = entry[1]
+            # Buang sisa variabel rerun sebelumnya, sisakan definisi saja
+            for name in [k for k in ns if k not in self.hoisted and not k.startswith("__")]:
+                del ns[name]
+        exec(self.body_code, ns)
+
+
+def load_page(path: str) -> CompiledPage:
+    """
+    CompiledPage untuk `path`, dikompilasi sekali per proses dan dikompilasi
+    ulang jika file berubah. FileNotFoundError jika file tidak ada.
+    """
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime
+    page = _pages.get(path)
+    if page is not None and page.mtime == mtime:
+        return page
+    with _lock:
+        page = _pages.get(path)
+        if page is None or page.mtime != mtime:
+            page = CompiledPage(path, mtime)
+            _pages[path] = page
+    return page
@@ -0,0 +1,98 @@
+# pwh_rollup.py (Rekap jumlah pasien multi-dimensi dalam satu query)
+#
+# Halaman rekap (03 gender, 05 pendidikan/pekerjaan, 07 propinsi) dulu masing-masing
+# menjalankan GROUP BY sendiri atas pwh.patients. Di sini semua kombinasi dimensi
+# dihitung dengan satu `GROUP BY GROUPING SETS` (satu scan, satu round trip), lalu
+# dipecah menjadi DataFrame per kombinasi. Hasil disimpan di memori proses per
+# versi data (pwh.data_version), sehingga dipakai bersama oleh semua sesi/halaman.
+import threading
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from pwh_db import data_version
+
+SOURCE_TABLES = ["pwh.patients", "pwh.hemo_diagnoses"]
+
+# Ekspresi per dimensi. Kolom teks bebas dinormalisasi: NULL/blank -> 'Unknown'.
+# Dimensi dari pwh.hemo_diagnoses membuat query memakai LEFT JOIN ke diagnosis.
+DIMENSIONS = {
+    "occupation": "COALESCE(NULLIF(TRIM(p.occupation::text), ''), 'Unknown')",
+    "education": "COALESCE(NULLIF(TRIM(p.education::text), ''), 'Unknown')",
+    "province": "COALESCE(NULLIF(TRIM(p.province::text), ''), 'Unknown')",
+    "gender": "p.gender::text",
+    "hemo_type": "d.hemo_type::text",
+}
+DIAGNOSIS_DIMENSIONS = {"hemo_type"}
+
+# Kombinasi yang dipakai halaman-halaman rekap (dihitung sekaligus)
+DASHBOARD_SETS = [("occupation",), ("education",), ("province",), ("gender", "hemo_type")]
+
+_lock = threading.Lock()
+_memo: dict = {}  # tuple(sets) -> (versi, hasil)
+
+
+def _rollup_sql(sets: list[tuple[str, ...]]) -> tuple[str, list[str]]:
+    dims = sorted({d for s in sets for d in s})
+    join, diag_id, diag_count = "", "", ""
+    if DIAGNOSIS_DIMENSIONS & set(dims):
+        join = "LEFT JOIN pwh.hemo_diagnoses d ON d.patient_id = p.id"
+        diag_id = "d.id AS diagnosis_id, "
+        diag_count = ", COUNT(diagnosis_id)::int AS jumlah_diagnosis"
+    cols = ",\n                ".join(f"{DIMENSIONS[d]} AS {d}" for d in dims)
+    grouping_sets = ", ".join(f"({', '.join(s)})" for s in sets)
+    # COUNT(DISTINCT) = jumlah pasien, walaupun LEFT JOIN ke diagnosis menggandakan baris;
+    # jumlah_diagnosis = baris diagnosis (hitungan lama halaman per jenis kelamin)
+    sql = f"""
+        SELECT {', '.join(dims)}, GROUPING({', '.join(dims)}) AS grouping_id,
+               COUNT(DISTINCT patient_id)::int AS jumlah{diag_count}
+        FROM (
+            SELECT p.id AS patient_id, {diag_id}
+                {cols}
+            FROM pwh.patients p
+            {join}
+        ) src
+        GROUP BY GROUPING SETS ({grouping_sets});
+    """
+    return sql, dims
+
+
+def rollup(engine: Engine, sets: list[tuple[str, ...]]) -> dict[tuple[str, ...], pd.DataFrame]:
+    """
+    Jumlah pasien untuk setiap kombinasi dimensi di `sets` (nama dari DIMENSIONS),
+    dalam satu query. Return: {kombinasi: DataFrame [dimensi..., jumlah]}, urut
+    jumlah terbesar; jika ada dimensi diagnosis, juga kolom jumlah_diagnosis
+    (jumlah baris diagnosis). Baris dengan nilai dimensi NULL (mis. pasien tanpa
+    diagnosis pada kombinasi dengan hemo_type) dibuang.
+    """
+    sql, dims = _rollup_sql(sets)
+    with engine.connect() as conn:
+        df = pd.read_sql(text(sql), conn)
+    measures = [c for c in ("jumlah", "jumlah_diagnosis") if c in df.columns]
+    out = {}
+    for s in sets:
+        # Bit GROUPING = 1 untuk dimensi yang TIDAK dikelompokkan; argumen pertama = bit tertinggi
+        mask = sum(1 << (len(dims) - 1 - i) for i, d in enumerate(dims) if d not in s)
+        part = df.loc[df["grouping_id"] == mask, list(s) + measures].dropna(subset=list(s))
+        out[tuple(s)] = part.sort_values(["jumlah", *s], ascending=[False] + [True] * len(s)).reset_index(drop=True)
+    return out
+
+
+def dashboard_rollups(engine: Engine) -> dict[tuple[str, ...], pd.DataFrame]:
+    """
+    rollup() untuk DASHBOARD_SETS, dihitung ulang hanya jika versi data
+    pasien/diagnosis berubah. Pemanggil tidak boleh mengubah DataFrame hasilnya.
+    """
+    key = tuple(DASHBOARD_SETS)
+    version = data_version(engine, SOURCE_TABLES)
+    cached = _memo.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _lock:
+        cached = _memo.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        result = rollup(engine, DASHBOARD_SETS)
+        _memo[key] = (version, result)
+        return result
@@ -0,0 +1,80 @@
+# pwh_search.py (Pencarian pasien & rumah sakit di sisi database)
+#
+# Pencarian memakai indeks trigram (pg_trgm + GIN, lihat sql/004_trigram_search.sql)
+# dan selalu dibatasi LIMIT, sehingga ukuran payload picker dan waktu lookup tetap
+# datar walaupun registri terus bertambah.
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+DEFAULT_LIMIT = 20
+
+# ILIKE '%x%' dan operator % (similarity) sama-sama dilayani indeks gin_trgm_ops.
+# Urutan: awalan yang cocok dulu, lalu skor kemiripan tertinggi.
+PATIENT_SEARCH_SQL = """
+    SELECT id, full_name, birth_date
+    FROM pwh.patients
+    WHERE full_name ILIKE :contains OR full_name % :q
+    ORDER BY (full_name ILIKE :prefix) DESC, similarity(full_name, :q) DESC, full_name
+    LIMIT :limit;
+"""
+
+# Pencarian "Cari Pasien" untuk edit: semua nama yang MENGANDUNG teks (seperti
+# sebelum typeahead), tanpa pencocokan kemiripan; batasnya lebih longgar.
+PATIENT_MATCH_SQL = """
+    SELECT id, full_name, birth_date
+    FROM pwh.patients
+    WHERE full_name ILIKE :contains
+    ORDER BY (full_name ILIKE :prefix) DESC, full_name, id
+    LIMIT :limit;
+"""
+MATCH_LIMIT = 200
+
+HOSPITAL_SEARCH_SQL = """
+    SELECT CONCAT_WS(' - ', nama_rs, kota, provinsi) AS hospital_display
+    FROM public.rumah_sakit
+    WHERE nama_rs ILIKE :contains OR nama_rs % :q
+    ORDER BY (nama_rs ILIKE :prefix) DESC, similarity(nama_rs, :q) DESC, nama_rs
+    LIMIT :limit;
+"""
+
+
+def _like_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _search_params(q: str, limit: int) -> dict:
+    q = (q or "").strip()
+    esc = _like_escape(q)
+    return {"q": q, "contains": f"%{esc}%", "prefix": f"{esc}%", "limit": int(limit)}
+
+
+def search_patients(engine: Engine, q: str, limit: int = DEFAULT_LIMIT) -> pd.DataFrame:
+    """Pasien yang namanya mirip `q` (maks. `limit` baris): id, full_name, birth_date."""
+    with engine.connect() as conn:
+        return pd.read_sql(text(PATIENT_SEARCH_SQL), conn, params=_search_params(q, limit))
+
+
+def find_patients(engine: Engine, q: str, limit: int = MATCH_LIMIT) -> tuple[pd.DataFrame, bool]:
+    """
+    Pasien yang namanya mengandung `q` (substring, tanpa fuzzy), maks. `limit`.
+    Return: (DataFrame id, full_name, birth_date; True jika hasil terpotong).
+    """
+    with engine.connect() as conn:
+        df = pd.read_sql(text(PATIENT_MATCH_SQL), conn, params=_search_params(q, limit + 1))
+    return df.head(limit), len(df) > limit
+
+
+def patient_name(engine: Engine, patient_id: int) -> str | None:
+    """Nama satu pasien berdasarkan id (untuk menampilkan pilihan saat mode edit)."""
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT full_name FROM pwh.patients WHERE id = :id"), {"id": int(patient_id)}
+        ).scalar()
+
+
+def search_hospitals(engine: Engine, q: str, limit: int = DEFAULT_LIMIT) -> list[str]:
+    """Label 'Nama RS - Kota - Propinsi' untuk RS yang namanya mirip `q`."""
+    with engine.connect() as conn:
+        df = pd.read_sql(text(HOSPITAL_SEARCH_SQL), conn, params=_search_params(q, limit))
+    return df["hospital_display"].tolist()
@@ -0,0 +1,157 @@
+# pwh_widgets.py (Komponen UI Streamlit yang dipakai ulang antar tab/halaman)
+from typing import Any, Callable, Iterable
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from pwh_db import data_version
+
+PAGE_SIZES = [25, 50, 100, 200]
+
+
+def typeahead(
+    label: str,
+    search: Callable[[str], list[tuple[Any, str]]],
+    key: str,
+    default: Any = None,
+    default_label: str | None = None,
+    min_chars: int = 2,
+    disabled: bool = False,
+    placeholder: str = "Ketik minimal 2 huruf untuk mencari...",
+) -> Any:
+    """
+    Kotak pencarian + selectbox hasil. `search(query)` dijalankan di database
+    dan mengembalikan list (value, label) yang sudah dibatasi jumlahnya, sehingga
+    browser hanya menerima beberapa opsi, bukan seluruh tabel.
+    Harus dipanggil di luar st.form (perlu rerun saat teks diketik).
+    Return: value terpilih atau None.
+    """
+    if disabled:
+        # Mode edit: pilihan dikunci ke record yang sedang diedit
+        st.selectbox(label, [default], format_func=lambda _: default_label or "", disabled=True, key=f"{key}::locked")
+        return default
+
+    query = st.text_input(f"🔎 {label}", key=f"{key}::q", placeholder=placeholder)
+    options: list[tuple[Any, str]] = []
+    if default is not None:
+        options.append((default, default_label or str(default)))
+    if len((query or "").strip()) >= min_chars:
+        options += [(v, lbl) for v, lbl in search(query.strip()) if v != default]
+        if not options:
+            st.caption("Tidak ada hasil yang cocok.")
+
+    labels = dict(options)
+    values = [None] + [v for v, _ in options]
+    return st.selectbox(
+        label,
+        values,
+        index=1 if default is not None else 0,
+        format_func=lambda v: "Pilih..." if v is None else labels.get(v, str(v)),
+        key=f"{key}::pick",
+    )
+
+
+def lazy_tabs(labels: list[str], key: str) -> str:
+    """
+    Pengganti st.tabs yang hanya menjalankan bagian aktif: st.tabs selalu
+    mengeksekusi semua isi tab di setiap rerun, sedangkan di sini pemanggil
+    cukup menulis `if active == label:` per bagian. Pilihan disimpan di
+    session_state sehingga tetap di tab yang sama setelah st.rerun().
+    """
+    return st.radio(key, labels, horizontal=True, key=key, label_visibility="collapsed")
+
+
+# ------------------------------------------------------------------------------
+# Tabel dengan paginasi keyset (seek) pada kolom id
+# ------------------------------------------------------------------------------
+def _fetch_page(engine: Engine, sql: str, params: dict, cursor: int | None, size: int) -> pd.DataFrame:
+    # `WHERE id < cursor ORDER BY id DESC LIMIT n` -> satu range scan pada indeks PK
+    # per halaman, berapa pun jauhnya halaman itu (tidak seperti OFFSET).
+    q = f"SELECT * FROM ({sql}) AS page_src"
+    if cursor is not None:
+        q += " WHERE page_src.id < :page_cursor"
+    q += " ORDER BY page_src.id DESC LIMIT :page_limit"
+    with engine.connect() as conn:
+        return pd.read_sql(text(q), conn, params={**params, "page_cursor": cursor, "page_limit": size + 1})
+
+
+def paged_table(
+    key: str,
+    engine: Engine,
+    sql: str,
+    tables: Iterable[str],
+    params: dict | None = None,
+    label: str = "Data",
+    page_size: int = 50,
+    prepare: Callable[[pd.DataFrame], pd.DataFrame] | None = None,
+    empty_message: str = "Belum ada data.",
+):
+    """
+    Tampilkan hasil `sql` (harus punya kolom `id`, tanpa ORDER BY/LIMIT) per
+    halaman, terbaru dulu. Halaman yang sudah diambil disimpan di session_state
+    dan hanya diambil ulang jika filter berubah atau versi data `tables`
+    (pwh.data_version) naik. `prepare(df)` dipakai untuk masking/alias kolom
+    sebelum ditampilkan.
+    """
+    params = dict(params or {})
+    size = st.selectbox(
+        "Baris per halaman", PAGE_SIZES,
+        index=PAGE_SIZES.index(page_size) if page_size in PAGE_SIZES else 1,
+        key=f"{key}::size",
+    )
+    sig = (sql, tuple(sorted(params.items())), size)
+    version = data_version(engine, list(tables))
+
+    state_key = f"{key}::pages"
+    state = st.session_state.get(state_key)
+    if state is None or state["sig"] != sig:
+        # Filter / ukuran halaman berubah: mulai lagi dari halaman pertama
+        state = {"sig": sig, "version": version, "page": 0, "cursors": [None], "pages": []}
+        st.session_state[state_key] = state
+    elif state["version"] != version:
+        # Data berubah: buang halaman yang tersimpan, tetap di halaman yang sama
+        state["version"] = version
+        state["cursors"] = state["cursors"][: state["page"] + 1]
+        state["pages"] = []
+
+    page = state["page"]
+    while len(state["pages"]) <= page:
+        i = len(state["pages"])
+        if i >= len(state["cursors"]):
+            page = state["page"] = i - 1
+            break
+        df = _fetch_page(engine, sql, params, state["cursors"][i], size)
+        has_next = len(df) > size
+        df = df.iloc[:size]
+        if i > 0 and df.empty:
+            # Halaman ini kosong setelah data dihapus: mundur satu halaman
+            page = state["page"] = i - 1
+            state["cursors"] = state["cursors"][:i]
+            state["pages"][page] = (state["pages"][page][0], False)
+            break
+        state["pages"].append((df, has_next))
+        if has_next:
+            state["cursors"] = state["cursors"][: i + 1] + [int(df["id"].iloc[-1])]
+    df, has_next = state["pages"][page]
+
+    if df.empty:
+        st.info(empty_message)
+        return
+
+    def _go(delta: int):
+        state["page"] = max(0, state["page"] + delta)
+
+    start = page * size + 1
+    display = prepare(df.copy()) if prepare else df.copy()
+    display.index = range(start, start + len(display))
+    display.index.name = "No."
+
+    st.write(f"{label}: baris **{start}–{start + len(display) - 1}** (halaman {page + 1})")
+    st.dataframe(display, use_container_width=True)
+    col_prev, col_next = st.columns(2)
+    with col_prev:
+        st.button("◀ Sebelumnya", key=f"{key}::prev", on_click=_go, args=(-1,), disabled=page == 0)
+    with col_next:
+        st.button("Berikutnya ▶", key=f"{key}::next", on_click=_go, args=(1,), disabled=not has_next)
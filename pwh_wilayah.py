@@ -0,0 +1,186 @@
+# pwh_wilayah.py (Snapshot referensi wilayah di disk)
+#
+# Hirarki wilayah (kelurahan -> kecamatan -> kota -> propinsi, ±80rb desa) dibangun
+# dengan self-join empat kali atas public.wilayah. Hasilnya jarang berubah, jadi
+# disimpan sebagai snapshot Parquet (kolumnar) di disk, dimuat sekali per proses,
+# dan hanya dibangun ulang jika hash isi public.wilayah berubah.
+import logging
+import os
+import threading
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+CACHE_DIR = os.environ.get("PWH_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+SNAPSHOT_PREFIX = "wilayah_"
+
+logger = logging.getLogger("pwh_wilayah")
+
+_lock = threading.Lock()
+_memo: dict = {"hash": None, "df": None, "index": None}
+
+HASH_SQL = """
+    SELECT md5(string_agg(kode || '|' || nama, E'\\n' ORDER BY kode))
+    FROM public.wilayah;
+"""
+
+HIERARCHY_SQL = """
+    SELECT
+        kel.kode  AS village_code,
+        kec.kode  AS district_code,
+        kota.kode AS city_code,
+        prov.kode AS province_code,
+        kel.nama  AS village_name,
+        kec.nama  AS district_name,
+        kota.nama AS city_name,
+        prov.nama AS province_name,
+        CONCAT_WS(' - ', kel.nama, kec.nama, kota.nama, prov.nama) AS full_display
+    FROM
+        public.wilayah AS kel
+    JOIN
+        public.wilayah AS kec ON kec.kode = LEFT(kel.kode, 8) -- e.g., 32.75.01
+    JOIN
+        public.wilayah AS kota ON kota.kode = LEFT(kel.kode, 5) -- e.g., 32.75
+    JOIN
+        public.wilayah AS prov ON prov.kode = LEFT(kel.kode, 2) -- e.g., 32
+    WHERE
+        LENGTH(kel.kode) = 13  -- Standard code length for village
+    ORDER BY
+        full_display;
+"""
+
+
+def _snapshot_path(content_hash: str) -> str:
+    return os.path.join(CACHE_DIR, f"{SNAPSHOT_PREFIX}{content_hash}.parquet")
+
+
+def _read_snapshot(path: str) -> pd.DataFrame | None:
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception as e:  # pyarrow tidak ada / file rusak -> bangun ulang
+        logger.warning("Snapshot wilayah tidak bisa dibaca (%s): %s", path, e)
+        return None
+
+
+def _write_snapshot(df: pd.DataFrame, path: str):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.warning("Snapshot wilayah tidak bisa ditulis: %s", e)
+        return
+    # Hapus snapshot versi lama
+    for name in os.listdir(CACHE_DIR):
+        old = os.path.join(CACHE_DIR, name)
+        if name.startswith(SNAPSHOT_PREFIX) and name.endswith(".parquet") and old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def load_wilayah(engine: Engine) -> pd.DataFrame:
+    """
+    Hirarki wilayah lengkap (kode + nama per level, dan full_display).
+    Urutan: memori proses -> snapshot disk dengan hash yang sama -> query DB.
+    """
+    df = _memo["df"]
+    if df is not None:
+        return df
+    with _lock:
+        if _memo["df"] is not None:
+            return _memo["df"]
+        with engine.connect() as conn:
+            content_hash = conn.execute(text(HASH_SQL)).scalar() or "empty"
+            path = _snapshot_path(content_hash)
+            df = _read_snapshot(path)
+            if df is None:
+                df = pd.read_sql(text(HIERARCHY_SQL), conn)
+                _write_snapshot(df, path)
+        _memo.update(hash=content_hash, df=df)
+        return df
+
+
+class WilayahIndex:
+    """
+    Indeks prefix atas kode wilayah untuk picker bertingkat
+    (propinsi 'PP' -> kota 'PP.KK' -> kecamatan 'PP.KK.CC' -> desa 'PP.KK.CC.DDDD').
+    Semua lookup O(1); setiap level hanya memuat anak dari level di atasnya.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.names: dict[str, str] = {}
+        self.children: dict[str, list[str]] = {}
+        self.villages: dict[str, dict] = {}
+        self.by_names: dict[tuple, str] = {}
+        levels = [
+            ("province_code", "province_name"),
+            ("city_code", "city_name"),
+            ("district_code", "district_name"),
+            ("village_code", "village_name"),
+        ]
+        parent_col = None
+        for code_col, name_col in levels:
+            level = df[[code_col, name_col] + ([parent_col] if parent_col else [])].drop_duplicates(code_col)
+            level = level.sort_values(name_col)
+            self.names.update(zip(level[code_col], level[name_col]))
+            parents = level[parent_col] if parent_col else pd.Series("", index=level.index)
+            for parent, codes in level.groupby(parents, sort=False)[code_col]:
+                self.children[parent] = codes.tolist()
+            parent_col = code_col
+        cols = ["village_name", "district_name", "city_name", "province_name"]
+        for row in df[["village_code"] + cols].itertuples(index=False):
+            rec = dict(zip(cols, row[1:]))
+            self.villages[row[0]] = rec
+            self.by_names[tuple(row[1:])] = row[0]
+
+    def options(self, parent_code: str = "") -> list[str]:
+        """Kode anak dari `parent_code` ('' = daftar propinsi)."""
+        return self.children.get(parent_code, [])
+
+    def name(self, code: str) -> str:
+        return self.names.get(code, "")
+
+    def village(self, village_code: str) -> dict | None:
+        """Nama desa/kecamatan/kota/propinsi untuk satu kode desa."""
+        return self.villages.get(village_code)
+
+    def find_village(self, village: str, district: str, city: str, province: str) -> str | None:
+        """Kode desa dari kombinasi nama (untuk mode edit data lama)."""
+        return self.by_names.get((village, district, city, province))
+
+    @staticmethod
+    def parents(village_code: str) -> tuple[str, str, str]:
+        """(kode propinsi, kode kota, kode kecamatan) dari prefix kode desa."""
+        return village_code[:2], village_code[:5], village_code[:8]
+
+
+def load_wilayah_index(engine: Engine) -> WilayahIndex:
+    """WilayahIndex untuk hirarki wilayah proses ini (dibangun sekali)."""
+    index = _memo["index"]
+    if index is not None:
+        return index
+    df = load_wilayah(engine)
+    with _lock:
+        if _memo["index"] is None and _memo["df"] is df:
+            _memo["index"] = WilayahIndex(df)
+        return _memo["index"] or WilayahIndex(df)
+
+
+def is_loaded() -> bool:
+    """True jika hirarki wilayah dan indeksnya sudah ada di memori proses ini."""
+    return _memo["index"] is not None
+
+
+def invalidate():
+    """
+    Lupakan salinan di memori. Pemanggilan load_wilayah() berikutnya menghitung
+    ulang hash; snapshot disk dipakai lagi jika isinya ternyata tidak berubah.
+    """
+    with _lock:
+        _memo.update(hash=None, df=None, index=None)
@@ -0,0 +1,45 @@
+-- 001_data_version.sql
+-- Penghitung perubahan per tabel. Setiap statement INSERT/UPDATE/DELETE/TRUNCATE
+-- pada tabel yang dipantau menaikkan `version` satu kali (trigger per statement).
+-- Dashboard memakai nilai ini sebagai kunci cache: satu lookup kecil per rerun,
+-- query berat hanya dijalankan ulang setelah data benar-benar berubah.
+--
+-- Trade-off: UPDATE pada baris versi mengunci baris itu sampai COMMIT, jadi
+-- transaksi tulis yang bersamaan pada tabel yang SAMA (simpan form, chunk bulk
+-- import) antre di kunci ini sesudah statement tulisnya. Tabel berbeda tidak
+-- saling menunggu. Ini disengaja: versi baru baru terlihat bersamaan dengan
+-- datanya saat COMMIT. Penghitung non-transaksional (mis. nextval sequence)
+-- tidak mengantre, tetapi versinya naik sebelum COMMIT, sehingga pembaca bisa
+-- menyimpan hasil query lama di bawah versi baru dan cache basi sampai
+-- perubahan berikutnya. Jaga transaksi tulis tetap pendek (import per chunk).
+
+CREATE TABLE IF NOT EXISTS pwh.data_version (
+    table_name  text        PRIMARY KEY,          -- 'schema.tabel'
+    version     bigint      NOT NULL DEFAULT 0,
+    changed_at  timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION pwh.bump_data_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO pwh.data_version AS dv (table_name, version, changed_at)
+    VALUES (TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME, 1, now())
+    ON CONFLICT (table_name)
+    DO UPDATE SET version = dv.version + 1, changed_at = now();
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_data_version ON pwh.patients;
+CREATE TRIGGER trg_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pwh.patients
+    FOR EACH STATEMENT EXECUTE FUNCTION pwh.bump_data_version();
+
+DROP TRIGGER IF EXISTS trg_data_version ON pwh.hemo_diagnoses;
+CREATE TRIGGER trg_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pwh.hemo_diagnoses
+    FOR EACH STATEMENT EXECUTE FUNCTION pwh.bump_data_version();
+
+INSERT INTO pwh.data_version (table_name)
+VALUES ('pwh.patients'), ('pwh.hemo_diagnoses')
+ON CONFLICT (table_name) DO NOTHING;
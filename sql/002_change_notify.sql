@@ -0,0 +1,46 @@
+-- 002_change_notify.sql
+-- Selain menaikkan pwh.data_version, trigger juga mengirim NOTIFY ke channel
+-- `pwh_changes` dengan payload 'schema.tabel'. Listener di setiap proses app
+-- (pwh_notify.py) mengosongkan cache yang bergantung pada tabel tersebut.
+-- NOTIFY bersifat transaksional: hanya terkirim setelah COMMIT, dan payload yang
+-- sama dalam satu transaksi digabung menjadi satu notifikasi.
+
+CREATE OR REPLACE FUNCTION pwh.bump_data_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    tbl text := TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME;
+BEGIN
+    INSERT INTO pwh.data_version AS dv (table_name, version, changed_at)
+    VALUES (tbl, 1, now())
+    ON CONFLICT (table_name)
+    DO UPDATE SET version = dv.version + 1, changed_at = now();
+    PERFORM pg_notify('pwh_changes', tbl);
+    RETURN NULL;
+END;
+$$;
+
+-- Pasang trigger di semua tabel yang datanya di-cache oleh halaman.
+-- Relasi yang tidak ada atau bukan tabel biasa (mis. view) dilewati dengan
+-- WARNING: cache yang bergantung padanya hanya diperbarui oleh TTL halaman.
+DO $$
+DECLARE
+    rel text;
+BEGIN
+    FOREACH rel IN ARRAY ARRAY[
+        'pwh.patients', 'pwh.hemo_diagnoses', 'pwh.hemo_inhibitors', 'pwh.virus_tests',
+        'pwh.treatment_hospital', 'pwh.death', 'pwh.contacts',
+        'pwh.hmhi_cabang', 'pwh.occupations', 'pwh.rumah_sakit_perawatan_hemofilia',
+        'public.rumah_sakit'
+    ] LOOP
+        IF EXISTS (SELECT 1 FROM pg_class WHERE oid = to_regclass(rel) AND relkind IN ('r', 'p')) THEN
+            EXECUTE format('DROP TRIGGER IF EXISTS trg_data_version ON %s', rel);
+            EXECUTE format(
+                'CREATE TRIGGER trg_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %s '
+                'FOR EACH STATEMENT EXECUTE FUNCTION pwh.bump_data_version()', rel);
+            INSERT INTO pwh.data_version (table_name) VALUES (rel) ON CONFLICT (table_name) DO NOTHING;
+        ELSE
+            RAISE WARNING 'pwh_changes: % tidak ada atau bukan tabel, trigger tidak dipasang (tidak ada NOTIFY untuk relasi ini)', rel;
+        END IF;
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,11 @@
+-- 003_wilayah_notify.sql
+-- Pantau public.wilayah agar snapshot wilayah (pwh_wilayah.py) di setiap proses
+-- dicek ulang hanya ketika data referensi wilayah benar-benar diubah.
+
+DROP TRIGGER IF EXISTS trg_data_version ON public.wilayah;
+CREATE TRIGGER trg_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.wilayah
+    FOR EACH STATEMENT EXECUTE FUNCTION pwh.bump_data_version();
+
+INSERT INTO pwh.data_version (table_name) VALUES ('public.wilayah')
+ON CONFLICT (table_name) DO NOTHING;
@@ -0,0 +1,12 @@
+-- 004_trigram_search.sql
+-- Indeks trigram untuk pencarian nama pasien & rumah sakit (typeahead di halaman
+-- input). Melayani `ILIKE '%x%'` maupun operator kemiripan `%` / similarity()
+-- tanpa sequential scan. Idempoten: aman dijalankan ulang.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_patients_full_name_trgm
+    ON pwh.patients USING gin (full_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_rumah_sakit_nama_rs_trgm
+    ON public.rumah_sakit USING gin (nama_rs gin_trgm_ops);
@@ -0,0 +1,7 @@
+-- 005_patient_name_index.sql
+-- Indeks fungsional untuk pencocokan nama pasien tanpa membedakan huruf besar/kecil:
+-- resolusi nama di bulk import (`lower(full_name) = ANY(:names)` / join unnest)
+-- dan cek nama ganda di form pasien. Idempoten: aman dijalankan ulang.
+
+CREATE INDEX IF NOT EXISTS idx_patients_lower_full_name
+    ON pwh.patients (lower(full_name));
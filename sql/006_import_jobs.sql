@@ -0,0 +1,27 @@
+-- 006_import_jobs.sql
+-- Job bulk import yang bisa dilanjutkan. Setiap chunk workbook di-commit bersama
+-- checkpoint-nya (sheet + index chunk terakhir), sehingga import yang terputus
+-- (tab browser ditutup / container restart) dilanjutkan dari chunk berikutnya
+-- saat workbook yang sama (workbook_hash) diunggah lagi. Idempoten.
+
+CREATE TABLE IF NOT EXISTS pwh.import_jobs (
+    id            bigserial PRIMARY KEY,
+    workbook_hash text        NOT NULL,
+    file_name     text,
+    status        text        NOT NULL DEFAULT 'queued',   -- queued | running | done | failed
+    sheet         text,                                    -- sheet dari chunk terakhir yang sudah commit
+    last_chunk    integer,                                 -- index chunk terakhir yang sudah commit
+    chunk_rows    integer     NOT NULL,
+    rows_done     integer     NOT NULL DEFAULT 0,
+    rows_total    integer,
+    counts        jsonb       NOT NULL DEFAULT '{}'::jsonb, -- {label sheet: baris masuk/diperbarui}
+    error         text,
+    created_at    timestamptz NOT NULL DEFAULT now(),
+    updated_at    timestamptz NOT NULL DEFAULT now()
+);
+
+-- Tabel yang dibuat versi sebelumnya (DEFAULT 'running')
+ALTER TABLE pwh.import_jobs ALTER COLUMN status SET DEFAULT 'queued';
+
+CREATE INDEX IF NOT EXISTS idx_import_jobs_hash
+    ON pwh.import_jobs (workbook_hash, id DESC);
@@ -0,0 +1,6 @@
+-- 007_import_jobs_chunks.sql
+-- Sheet turunan bulk import diimpor paralel, sehingga checkpoint dicatat per
+-- sheet: {label sheet: index chunk terakhir yang sudah commit}. Idempoten.
+
+ALTER TABLE pwh.import_jobs
+    ADD COLUMN IF NOT EXISTS chunks jsonb NOT NULL DEFAULT '{}'::jsonb;
@@ -0,0 +1,68 @@
+-- 008_delta_export.sql
+-- Pelacakan perubahan untuk export delta (hanya baris yang berubah sejak export
+-- terakhir seorang user):
+--   * kolom updated_at di setiap tabel entitas, diisi trigger saat INSERT/UPDATE
+--   * pwh.deleted_rows: tombstone untuk baris yang dihapus
+--   * pwh.export_watermarks: waktu export delta terakhir per user
+-- Idempoten; tabel yang tidak ada dilewati.
+
+CREATE OR REPLACE FUNCTION pwh.touch_updated_at() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$;
+
+CREATE TABLE IF NOT EXISTS pwh.deleted_rows (
+    id          bigserial PRIMARY KEY,
+    table_name  text        NOT NULL,
+    row_id      bigint      NOT NULL,
+    patient_id  bigint,
+    deleted_at  timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS deleted_rows_deleted_at_idx ON pwh.deleted_rows (deleted_at);
+
+CREATE OR REPLACE FUNCTION pwh.record_deleted_row() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO pwh.deleted_rows (table_name, row_id, patient_id)
+    VALUES (TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME, OLD.id,
+            CASE WHEN TG_TABLE_NAME = 'patients' THEN OLD.id ELSE (to_jsonb(OLD) ->> 'patient_id')::bigint END);
+    RETURN NULL;
+END;
+$$;
+
+CREATE TABLE IF NOT EXISTS pwh.export_watermarks (
+    user_name    text PRIMARY KEY,
+    exported_at  timestamptz NOT NULL,
+    rows         integer     NOT NULL DEFAULT 0,
+    updated_at   timestamptz NOT NULL DEFAULT now()
+);
+
+DO $$
+DECLARE
+    rel text;
+    tbl text;
+BEGIN
+    FOREACH rel IN ARRAY ARRAY[
+        'pwh.patients', 'pwh.hemo_diagnoses', 'pwh.hemo_inhibitors', 'pwh.virus_tests',
+        'pwh.treatment_hospital', 'pwh.death', 'pwh.contacts'
+    ] LOOP
+        IF EXISTS (SELECT 1 FROM pg_class WHERE oid = to_regclass(rel) AND relkind IN ('r', 'p')) THEN
+            tbl := split_part(rel, '.', 2);
+            -- now() stabil: baris lama mendapat waktu migrasi tanpa rewrite tabel
+            EXECUTE format('ALTER TABLE %s ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now()', rel);
+            EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %s (updated_at)', tbl || '_updated_at_idx', rel);
+            EXECUTE format('DROP TRIGGER IF EXISTS trg_touch_updated_at ON %s', rel);
+            EXECUTE format(
+                'CREATE TRIGGER trg_touch_updated_at BEFORE INSERT OR UPDATE ON %s '
+                'FOR EACH ROW EXECUTE FUNCTION pwh.touch_updated_at()', rel);
+            EXECUTE format('DROP TRIGGER IF EXISTS trg_record_deleted_row ON %s', rel);
+            EXECUTE format(
+                'CREATE TRIGGER trg_record_deleted_row AFTER DELETE ON %s '
+                'FOR EACH ROW EXECUTE FUNCTION pwh.record_deleted_row()', rel);
+        END IF;
+    END LOOP;
+END;
+$$;
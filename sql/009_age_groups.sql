@@ -0,0 +1,30 @@
+-- 009_age_groups.sql
+-- Batas kelompok usia untuk rekap per kelompok usia (02_rekap_pwh.py). Rekap
+-- dihitung dengan GROUP BY di database memakai tabel ini, jadi halaman hanya
+-- menerima jumlah per (kelompok usia, jenis hemofilia). max_age NULL = tanpa batas
+-- atas; sort_order = urutan baris di tabel rekap. Perubahan tabel ini menaikkan
+-- pwh.data_version + NOTIFY (sql/002), sehingga cache rekap ikut diperbarui. Idempoten.
+
+CREATE TABLE IF NOT EXISTS pwh.age_groups (
+    label       text PRIMARY KEY,
+    min_age     integer NOT NULL,
+    max_age     integer,
+    sort_order  integer NOT NULL
+);
+
+INSERT INTO pwh.age_groups (label, min_age, max_age, sort_order) VALUES
+    ('>45',   45, NULL, 1),
+    ('19-44', 19, 44,   2),
+    ('14-18', 14, 18,   3),
+    ('5-13',   5, 13,   4),
+    ('0-4',    0, 4,    5)
+ON CONFLICT (label) DO NOTHING;
+
+DROP TRIGGER IF EXISTS trg_data_version ON pwh.age_groups;
+CREATE TRIGGER trg_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pwh.age_groups
+    FOR EACH STATEMENT EXECUTE FUNCTION pwh.bump_data_version();
+
+INSERT INTO pwh.data_version (table_name)
+VALUES ('pwh.age_groups')
+ON CONFLICT (table_name) DO NOTHING;